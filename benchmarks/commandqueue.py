@@ -0,0 +1,78 @@
+"""Throughput and tail latency of power commands under synthetic bursts.
+
+Compares commands sent directly from request threads against the
+``CommandQueue``, against a fake Tellstick.
+
+Run from repository root: ``python -m benchmarks.commandqueue``
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import random
+import time
+
+from stick.commandqueue import AUTOMATION, INTERACTIVE, CommandQueue
+from stick.tellstick import Tellstick
+
+from tests.fake_tellstick import FakeTellstick
+
+DEVICES = 10
+CLIENTS = 20
+COMMANDS_PER_CLIENT = 25
+RATE = 100.0  # commands per second allowed by queue
+LATENCY = 0.005  # seconds per tellstick call
+
+
+def _burst(power):
+    random.seed(1)
+    plan = [[(random.randint(1, DEVICES), random.random() < 0.5,
+              INTERACTIVE if random.random() < 0.2 else AUTOMATION)
+             for _ in range(COMMANDS_PER_CLIENT)] for _ in range(CLIENTS)]
+
+    def client(commands):
+        latencies = []
+        for id, on_off, priority in commands:
+            start = time.perf_counter()
+            power(id, on_off, priority)
+            latencies.append((priority, time.perf_counter() - start))
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(CLIENTS) as executor:
+        latencies = [latency for result in executor.map(client, plan) for latency in result]
+    return time.perf_counter() - start, latencies
+
+
+def _percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))] * 1000 if values else 0.0
+
+
+def _report(name, elapsed, latencies, upstream):
+    print('%-8s requests=%i upstream=%i elapsed=%.2fs throughput=%.0f/s' % (
+        name, len(latencies), upstream, elapsed, len(latencies) / elapsed))
+    for priority, label in ((INTERACTIVE, 'interactive'), (AUTOMATION, 'automation')):
+        values = [latency for p, latency in latencies if p == priority]
+        print('         %-11s p50=%.1fms p99=%.1fms' % (label, _percentile(values, 0.5), _percentile(values, 0.99)))
+
+
+def main():
+    """Run benchmark and print results."""
+    with FakeTellstick(devices=DEVICES, latency=LATENCY) as fake:
+        client = Tellstick('user', 'secret', address=fake.address)
+        client.get_devices()
+
+        def upstream():
+            return fake.calls['/api/device/turnOn'] + fake.calls['/api/device/turnOff']
+
+        before = upstream()
+        elapsed, latencies = _burst(lambda id, on_off, priority: client.power(id, on_off))
+        _report('direct', elapsed, latencies, upstream() - before)
+
+        queue = CommandQueue(client.power, rate=RATE)
+        before = upstream()
+        elapsed, latencies = _burst(queue.power)
+        _report('queued', elapsed, latencies, upstream() - before)
+
+
+if __name__ == '__main__':
+    main()
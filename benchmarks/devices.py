@@ -0,0 +1,66 @@
+"""Memory per device and listing time of the device registry at 10,000 devices.
+
+Run from repository root: ``python -m benchmarks.devices``
+"""
+
+import gc
+import json
+import time
+import tracemalloc
+
+from stick.commandqueue import CommandQueue
+from stick.onoffdevice import OnOffDevice
+from stick.registry import DeviceRegistry
+
+from tests.fake_tellstick import TURNOFF, TURNON
+
+DEVICES = 10000
+ROUNDS = 20
+
+
+def _raw_devices():
+    """Devices as listed by tellstick, parsed from json as the client does."""
+    body = json.dumps({'device': [{'id': i, 'name': 'device-%i' % i, 'state': TURNOFF,
+                                   'methods': TURNON | TURNOFF} for i in range(1, DEVICES + 1)]})
+    return json.loads(body)['device']
+
+
+def _register(raw_devices, client):
+    registry = DeviceRegistry()
+    registry.update(raw_devices, lambda raw_device: OnOffDevice(raw_device['name'], raw_device, client))
+    return registry
+
+
+def _timed(function):
+    gc.collect()
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        function()
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+
+def main():
+    """Run benchmark and print results."""
+    client = CommandQueue(lambda id, on_off: True)
+
+    raw_devices = _raw_devices()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    registry = _register(raw_devices, client)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    print('devices=%i memory=%.0f bytes/device' % (DEVICES, used / DEVICES))
+
+    print('register  %.2fms' % _timed(lambda: _register(raw_devices, client)))
+    print('relist    %.2fms' % _timed(lambda: registry.update(raw_devices, None)))
+    print('reconcile %.2fms' % _timed(lambda: registry.reconcile(raw_devices, lambda id: False)))
+    print('list      %.2fms' % _timed(registry.devices))
+    print('document  %.2fms' % _timed(
+        lambda: json.dumps({'devices': [device.json() for device in registry.devices()]})))
+
+
+if __name__ == '__main__':
+    main()
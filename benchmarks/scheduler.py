@@ -0,0 +1,59 @@
+"""Cost of many idle schedules, and of dispatching a large batch at once.
+
+Run from repository root: ``python -m benchmarks.scheduler``
+"""
+
+from threading import Event
+import gc
+import time
+import tracemalloc
+
+from stick.scheduler import Scheduler
+
+SCHEDULES = 100000
+IDLE = 2.0  # seconds to measure idle cpu
+BATCH = 10000
+
+
+def main():
+    """Run benchmark and print results."""
+    scheduler = Scheduler(lambda batch: None)
+    action = {'group': 'sunset', 'power': 'on'}
+    start_at = time.time() + 3600
+
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(SCHEDULES):
+        scheduler.add(action, at=start_at + i, every=86400)
+    elapsed = time.perf_counter() - start
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print('schedules=%i add=%.1fus/schedule memory=%.0f bytes/schedule' % (
+        SCHEDULES, elapsed / SCHEDULES * 1e6, used / SCHEDULES))
+
+    cpu = time.process_time()
+    time.sleep(IDLE)
+    print('idle cpu=%.2fms over %.0fs' % ((time.process_time() - cpu) * 1000, IDLE))
+    scheduler.stop()
+
+    done = Event()
+    dispatched = []
+
+    def dispatch(batch):
+        dispatched.append((time.time(), len(batch)))
+        done.set()
+
+    scheduler = Scheduler(dispatch)
+    due = time.time() + 0.5
+    for _ in range(BATCH):
+        scheduler.add(action, at=due)
+    done.wait()
+    time.sleep(0.1)  # any further batches
+    print('batch of %i due together: %i dispatch call(s), first %.1fms after due with %i actions' % (
+        BATCH, len(dispatched), (dispatched[0][0] - due) * 1000, dispatched[0][1]))
+    scheduler.stop()
+
+
+if __name__ == '__main__':
+    main()
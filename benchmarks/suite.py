@@ -0,0 +1,203 @@
+"""Benchmark suite against a local fake Tellstick, results as json.
+
+Scenarios:
+
+- ``startup``, discovery, authorization and first device listing, until
+  the first ``/devices`` can be answered.
+- ``devices``, ``/devices`` throughput at 10, 1,000 and 10,000 devices:
+  device listing and document serialization, both when the device cache
+  is cold and every request lists from the tellstick, and when it is warm.
+- ``power``, power command latency percentiles with concurrent callers,
+  through the command queue as the endpoints send them.
+
+Fake tellstick latency and failure rate are configurable. Results are
+written as json, to stdout or a file, so runs can be compared.
+
+Run from repository root: ``python -m benchmarks.suite --output results.json``
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+
+import stick.tellstick as tellstick
+from stick.tellstick import Tellstick
+
+from tests.fake_tellstick import FakeTellstick
+
+DEVICE_COUNTS = (10, 1000, 10000)
+STARTUP_RUNS = 5
+DEVICES_DURATION = 2.0  # seconds to run each devices measurement
+POWER_CLIENTS = 16
+POWER_COMMANDS = 50  # per client
+POWER_RATE = 1000.0  # commands per second allowed by queue, high enough not to dominate latency
+
+
+def _percentiles(values):
+    """Get latency summary, in milliseconds."""
+    values = sorted(values)
+    if not values:
+        return {}
+
+    def at(share):
+        return round(values[min(len(values) - 1, int(len(values) * share))] * 1000, 3)
+
+    return {'p50': at(0.5), 'p90': at(0.9), 'p99': at(0.99), 'max': round(values[-1] * 1000, 3)}
+
+
+def _devices_document(client):
+    """Build ``/devices`` document, as the endpoint does whenever a device has changed."""
+    return json.dumps({'devices': [device.json() for device in client.get_devices()]},
+                      separators=(',', ':')).encode('utf-8')
+
+
+def startup(latency, failure_rate):
+    """Measure time from start until first device listing, by phase."""
+    phases = {'discovery': [], 'authorization': [], 'listing': [], 'total': []}
+
+    with FakeTellstick(devices=100, latency=latency, failure_rate=failure_rate) as fake:
+        tellstick.DISCOVERY_ADDRESS = fake.discovery_address
+
+        for _ in range(STARTUP_RUNS):
+            start = time.perf_counter()
+            address = tellstick.discover_tellstick()
+            discovered = time.perf_counter()
+            assert address == '127.0.0.1'
+
+            client = Tellstick('user', 'secret', address=fake.address, reconcile={'enabled': False})
+            client._try_dicovered_and_authorized()
+            authorized = time.perf_counter()
+
+            _devices_document(client)
+            listed = time.perf_counter()
+
+            phases['discovery'].append(discovered - start)
+            phases['authorization'].append(authorized - discovered)
+            phases['listing'].append(listed - authorized)
+            phases['total'].append(listed - start)
+
+    return {phase: _percentiles(values) for phase, values in phases.items()}
+
+
+def devices(latency, failure_rate):
+    """Measure ``/devices`` throughput per device count, cold and warm cache."""
+    results = {}
+
+    for count in DEVICE_COUNTS:
+        with FakeTellstick(devices=count, latency=latency, failure_rate=failure_rate) as fake:
+            result = {}
+            for cache in ('cold', 'warm'):
+                client = Tellstick('user', 'secret', address=fake.address, cache={'ttl': 3600},
+                                   reconcile={'enabled': False})
+                _devices_document(client)  # authorize
+
+                latencies = []
+                listings = fake.calls['/api/devices/list']
+                deadline = time.perf_counter() + DEVICES_DURATION
+                while time.perf_counter() < deadline:
+                    start = time.perf_counter()
+                    if cache == 'cold':
+                        client.reconcile()  # lists from tellstick, as an expired cache does
+                    _devices_document(client)
+                    latencies.append(time.perf_counter() - start)
+
+                result[cache] = {
+                    'requests': len(latencies),
+                    'requests_per_second': round(len(latencies) / sum(latencies), 1),
+                    'latency_ms': _percentiles(latencies),
+                    'upstream_listings': fake.calls['/api/devices/list'] - listings
+                }
+            results[str(count)] = result
+
+    return results
+
+
+def power(latency, failure_rate):
+    """Measure power command latency with concurrent callers."""
+    with FakeTellstick(devices=100, latency=latency, failure_rate=failure_rate) as fake:
+        client = Tellstick('user', 'secret', address=fake.address, commands={'rate': POWER_RATE},
+                           reconcile={'enabled': False})
+        devices = client.get_devices()
+
+        random.seed(1)
+        plan = [[(random.choice(devices), random.random() < 0.5) for _ in range(POWER_COMMANDS)]
+                for _ in range(POWER_CLIENTS)]
+
+        def caller(commands):
+            results = []
+            for device, on_off in commands:
+                start = time.perf_counter()
+                successful = device.set_power(on_off)
+                results.append((time.perf_counter() - start, successful))
+            return results
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(POWER_CLIENTS) as executor:
+            results = [result for results in executor.map(caller, plan) for result in results]
+        elapsed = time.perf_counter() - start
+
+        return {
+            'clients': POWER_CLIENTS,
+            'commands': len(results),
+            'successful': sum(1 for _, successful in results if successful),
+            'commands_per_second': round(len(results) / elapsed, 1),
+            'latency_ms': _percentiles([latency for latency, _ in results]),
+            'upstream_commands': fake.calls['/api/device/turnOn'] + fake.calls['/api/device/turnOff'],
+            'queue': client.command_stats()
+        }
+
+
+SCENARIOS = {
+    'startup': startup,
+    'devices': devices,
+    'power': power
+}
+
+
+def _revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    """Run selected scenarios and write results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='scenario to run, may be repeated, default all')
+    parser.add_argument('--latency', type=float, default=0.005, help='fake tellstick latency, seconds')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='share of failed power commands')
+    parser.add_argument('--output', help='write results to file instead of stdout')
+    args = parser.parse_args()
+
+    results = {
+        'revision': _revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': int(time.time()),
+        'latency': args.latency,
+        'failure_rate': args.failure_rate,
+        'scenarios': {}
+    }
+
+    for name in args.scenario or sorted(SCENARIOS):
+        print('running %s...' % name, file=sys.stderr)
+        results['scenarios'][name] = SCENARIOS[name](args.latency, args.failure_rate)
+
+    document = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(document + '\n')
+    else:
+        print(document)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Compare per-command latency of pooled ``Transport`` against one-shot requests.
+
+Run from repository root: ``python -m benchmarks.transport``
+"""
+
+import statistics
+import time
+
+import requests
+
+from stick.transport import Transport
+
+from tests.fake_tellstick import FakeTellstick
+
+COMMANDS = 500
+
+
+def _measure(call):
+    latencies = []
+    for i in range(COMMANDS):
+        start = time.perf_counter()
+        response = call(i % 10 + 1)
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200
+    return latencies
+
+
+def _report(name, latencies, connections):
+    latencies = sorted(latencies)
+    print('%-10s mean=%.3fms p50=%.3fms p99=%.3fms connections=%i' % (
+        name,
+        statistics.mean(latencies) * 1000,
+        latencies[len(latencies) // 2] * 1000,
+        latencies[int(len(latencies) * 0.99)] * 1000,
+        connections))
+
+
+def main():
+    """Run benchmark and print results."""
+    with FakeTellstick() as fake:
+        headers = {'Authorization': 'Bearer %s' % fake.token}
+        url = 'http://%s/api/device/turnOn' % fake.address
+
+        latencies = _measure(lambda id: requests.get(url, params={'id': id}, headers=headers))
+        _report('one-shot', latencies, fake.connections)
+
+        fake.connections = 0
+        transport = Transport(fake.address)
+        transport.set_bearer(fake.token)
+        latencies = _measure(lambda id: transport.get('/api/device/turnOn', params={'id': id}))
+        _report('pooled', latencies, fake.connections)
+        transport.close()
+
+
+if __name__ == '__main__':
+    main()
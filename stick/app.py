@@ -6,9 +6,21 @@ Current supported on-off devices:
 - Nexa switch.
 """
 
+import json
 import logging as loggr
 import os
-
+import time
+import uuid
+
+from flask import g, request
+
+from stick.breaker import OPEN
+from stick.cluster import TellstickCluster
+from stick.commandqueue import AUTOMATION
+from stick.events import EVENT_LOG_SIZE, EventLog
+from stick.jobs import JobRegistry
+from stick.metrics import REGISTRY
+from stick.scheduler import MAX_SCHEDULES, MIN_INTERVAL, Scheduler
 from stick.tellstick import Tellstick
 
 from smrt import SMRTApp, app, make_response, jsonify, smrt
@@ -16,6 +28,14 @@ from smrt import ResouceNotFound
 
 log = loggr.getLogger('smrt')
 
+EVENTS_TIMEOUT = 30  # seconds
+EVENTS_MAX_TIMEOUT = 60  # seconds
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram('stick_http_request_seconds',
+                                          'Duration of stick api requests.', ['method', 'route'])
+HTTP_REQUESTS = REGISTRY.counter('stick_http_requests_total',
+                                 'Stick api requests by status.', ['method', 'route', 'status'])
+
 
 class Stick(SMRTApp):
     """Stick is a ``SMRTApp`` that is to be registered with SMRT."""
@@ -31,7 +51,39 @@ class Stick(SMRTApp):
         if not hasattr(self, '_config') or self._config is None:
             raise RuntimeError('cannot start without valid configuration file.')
 
-        self._client = Tellstick(self._config['tellstick_api']['username'], self._config['tellstick_api']['password'])
+        self._instance = uuid.uuid4().hex[:8]  # etags and event cursors from another process never match
+        self._events = EventLog(self._config.get('events', {}).get('size', EVENT_LOG_SIZE), self._instance)
+
+        tellstick_api = self._config['tellstick_api']
+        options = {
+            'state_file': tellstick_api.get('state_file'),
+            'shared_state': tellstick_api.get('shared_state'),
+            'transport': tellstick_api.get('transport'),
+            'cache': tellstick_api.get('cache'),
+            'commands': tellstick_api.get('commands'),
+            'events': self._events,
+            'reconcile': tellstick_api.get('reconcile')
+        }
+
+        if 'addresses' in tellstick_api or tellstick_api.get('discover_all', False):
+            self._client = TellstickCluster(tellstick_api['username'], tellstick_api['password'],
+                                            addresses=tellstick_api.get('addresses'), **options)
+        else:
+            self._client = Tellstick(tellstick_api['username'], tellstick_api['password'],
+                                     address=tellstick_api.get('address'), **options)
+
+        self._jobs = JobRegistry()
+
+        self._documents = (None, {})  # (registry version, serialized documents)
+
+        self._groups = {group['name']: group['devices'] for group in self._config.get('groups', [])}
+
+        scheduler = self._config.get('scheduler', {})
+        self._scheduler = Scheduler(self._run_scheduled,
+                                    scheduler.get('max_schedules', MAX_SCHEDULES),
+                                    scheduler.get('min_interval', MIN_INTERVAL))
+
+        self._register_metrics()
 
         log.debug('%s initiated!', self.application_name())
 
@@ -40,9 +92,59 @@ class Stick(SMRTApp):
         return {
             'name': self.application_name(),
             'status': 'OK',
-            'version': self.version()
+            'version': self.version(),
+            'cache': self._client.cache_stats(),
+            'commands': self._client.command_stats(),
+            'breaker': self._client.breaker_stats(),
+            'schedules': len(self._scheduler)
         }
 
+    def _register_metrics(self):
+        """Register metrics read from client counters when metrics are rendered."""
+        def per_controller(stats):
+            if isinstance(self._client, TellstickCluster):
+                return list(stats().items())
+            return [(self._client.address, stats())]
+
+        def cache(name, results):
+            return lambda: [({'controller': str(address), 'result': result}, counters[name][key])
+                            for address, counters in per_controller(self._client.cache_stats)
+                            for key, result in results.items()]
+
+        def commands(counter):
+            return lambda: [({'controller': str(address)}, counters[counter])
+                            for address, counters in per_controller(self._client.command_stats)]
+
+        def breaker():
+            return [({'controller': str(address)}, 1 if counters['state'] == OPEN else 0)
+                    for address, counters in per_controller(self._client.breaker_stats)]
+
+        REGISTRY.collected('stick_device_cache_requests_total', 'counter', 'Device list cache lookups by result.',
+                           cache('devices', {'hits': 'hit', 'stale_hits': 'stale_hit', 'misses': 'miss'}))
+        REGISTRY.collected('stick_device_cache_loads_total', 'counter', 'Device list loads, misses and refreshes.',
+                           lambda: [({'controller': str(address)}, counters['devices']['loads'])
+                                    for address, counters in per_controller(self._client.cache_stats)])
+        REGISTRY.collected('stick_unknown_name_cache_requests_total', 'counter',
+                           'Unknown device name cache lookups by result.',
+                           cache('unknown_names', {'hits': 'hit', 'misses': 'miss'}))
+        REGISTRY.collected('stick_commands_sent_total', 'counter', 'Power commands sent to tellstick.',
+                           commands('sent'))
+        REGISTRY.collected('stick_commands_coalesced_total', 'counter',
+                           'Power commands replaced by a later command before being sent.', commands('coalesced'))
+        REGISTRY.collected('stick_commands_pending', 'gauge', 'Power commands waiting to be sent.',
+                           commands('pending'))
+        REGISTRY.collected('stick_circuit_breaker_open', 'gauge', 'If circuit breaker is open, 1, otherwise 0.',
+                           breaker)
+        REGISTRY.collected('stick_events_cursor', 'counter', 'Device events appended to event log.',
+                           lambda: [({}, self._events.count)])
+
+    def get_metrics(self):
+        """Get all metrics in Prometheus text format.
+
+        :returns: ``String``
+        """
+        return REGISTRY.render()
+
     @staticmethod
     def application_name():
         """See ``SMRTApp`` documentation for ``application_name`` implementation."""
@@ -74,12 +176,220 @@ class Stick(SMRTApp):
         """
         return self._client.get_device(name)
 
+    def get_events(self, cursor, timeout):
+        """Get device events after cursor, see ``EventLog.since``.
+
+        :param cursor: ``String`` last cursor seen, or ``None`` for latest cursor only
+        :param timeout: ``Float`` seconds to wait for new events
+        :returns: ``Dict`` events document
+        """
+        if cursor is None:
+            return {'cursor': self._events.cursor, 'events': [], 'reset': False}
+
+        events, cursor, reset = self._events.since(cursor, timeout)
+        return {'cursor': cursor, 'events': events, 'reset': reset}
+
+    def get_devices_document(self):
+        """Get serialized document with all devices, see ``get_devices``.
+
+        :returns: ``(bytes, String)`` body and etag
+        """
+        self.get_devices()  # lets device cache refresh before version is read
+        return self._document(('list',), lambda: {'devices': [device.json() for device in self.get_devices()]})
+
+    def get_device_document(self, device):
+        """Get serialized document for device.
+
+        :param device: ``OnOffDevice``
+        :returns: ``(bytes, String)`` body and etag
+        """
+        return self._document(('device', device.get_name()), device.json)
+
+    def _document(self, key, build):
+        """Get serialized document, cached until device registry version changes.
+
+        Version is read before document is built, so a cached document is
+        never older than its version.
+
+        :param key: ``Tuple`` document key, ``('list',)`` or ``('device', name)``
+        :param build: ``Callable`` returning json serializable document
+        :returns: ``(bytes, String)`` body and etag
+        """
+        version = self._client.registry_version()
+
+        documents = self._documents
+        if documents[0] != version:
+            documents = self._documents = (version, {})
+
+        document = documents[1].get(key)
+        if document is None:
+            body = json.dumps(build(), separators=(',', ':')).encode('utf-8')
+            document = documents[1][key] = (body, '%s-%i' % (self._instance, version))
+
+        return document
+
+    def set_power_async(self, device, on_off):
+        """Set power for device in the background.
+
+        Device state is updated optimistically, and job finishes when the
+        command has been sent.
+
+        :param device: ``OnOffDevice`` to set power for.
+        :param on_off: ``Boolean`` power state.
+        :returns: ``Dict`` created job.
+        """
+        job = self._jobs.create(device.get_name(), on_off)
+
+        future = device.set_power_async(on_off)
+        future.add_done_callback(lambda done: self._jobs.finish(job['id'], done.result()))
+
+        return job
+
+    def get_job(self, id):
+        """Get background power job.
+
+        :param id: ``String`` job id.
+        :returns: ``Dict`` job or ``None``
+        """
+        return self._jobs.get(id)
+
+    def get_group(self, name):
+        """Get device names in a configured group.
+
+        :param name: ``String`` group name.
+        :returns: ``[String]`` or ``None``
+        """
+        return self._groups.get(name)
+
+    def add_schedule(self, action, at, every):
+        """Schedule power action, see ``Scheduler.add``.
+
+        :param action: ``Dict`` with ``power``, and ``devices`` and/or ``group``
+        :param at: ``Float`` unix time of first run, or ``None``
+        :param every: ``Float`` seconds between runs, or ``None`` to run once
+        :returns: ``Dict`` schedule, or ``None`` if there are too many schedules
+        :raises ValueError: if ``at`` or ``every`` is invalid
+        """
+        return self._scheduler.add(action, at, every)
+
+    def get_schedules(self):
+        """Get all scheduled power actions, earliest first.
+
+        :returns: ``[Dict]``
+        """
+        return self._scheduler.schedules()
+
+    def get_schedule(self, id):
+        """Get scheduled power action.
+
+        :param id: ``String`` schedule id.
+        :returns: ``Dict`` schedule or ``None``
+        """
+        return self._scheduler.get(id)
+
+    def delete_schedule(self, id):
+        """Delete scheduled power action.
+
+        :param id: ``String`` schedule id.
+        :returns: ``Boolean`` if schedule existed
+        """
+        return self._scheduler.delete(id)
+
+    def _run_scheduled(self, actions):
+        """Send power commands for a batch of due scheduled actions.
+
+        All names in the batch are resolved in one pass, groups as configured
+        now. Commands are queued with automation priority, without waiting
+        for them to be sent.
+        """
+        targets = []
+        for action in actions:
+            names = list(action.get('devices', []))
+            if 'group' in action:
+                names += self._groups.get(action['group'], [])
+            targets.append((names, action['power']))
+
+        devices = self._client.get_devices_by_name(list({name for names, _ in targets for name in names}))
+
+        for names, power in targets:
+            for name in names:
+                device = devices[name]
+                if device is None:
+                    log.debug('[stick] scheduled device "%s" not found', name)
+                    continue
+
+                on_off = device.toggled_power() if power == 'toggle' else power == 'on'
+                device.set_power_async(on_off, AUTOMATION)
+
+    def set_power_many(self, names, action):
+        """Set power for several devices, identified by name.
+
+        All names are resolved in one pass, and all commands are queued with
+        automation priority before waiting for any, so a bulk request does
+        not hold back power commands from users. Commands are sent by the
+        command queue, one at a time within its rate.
+
+        :param names: ``[String]`` device names.
+        :param action: ``String`` one of ``on``, ``off`` or ``toggle``.
+        :returns: ``[Dict]`` result per device, in same order as names.
+        """
+        devices = self._client.get_devices_by_name(names)
+
+        submitted = []
+        for name in names:
+            device = devices[name]
+            if device is None:
+                submitted.append((name, None, None))
+                continue
+
+            on_off = device.toggled_power() if action == 'toggle' else action == 'on'
+            submitted.append((name, device, device.submit_power(on_off, AUTOMATION)))
+
+        results = []
+        for name, device, future in submitted:
+            if device is None:
+                results.append({'name': name, 'successful': False, 'error': 'NotFound'})
+                continue
+
+            successful = future.result()
+            results.append({'name': name, 'successful': successful, 'power': device.json()['power']})
+
+        return results
+
 
 # create prism and register it with smrt
 stick = Stick()
 app.register_application(stick)
 
 
+@app.before_request
+def _start_timer():
+    g.stick_started = time.perf_counter()
+
+
+@app.after_request
+def _observe_request(response):
+    """Record duration and status of request, per route."""
+    started = g.pop('stick_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, request.method, route)
+        HTTP_REQUESTS.inc(request.method, route, str(response.status_code))
+    return response
+
+
+@smrt('/metrics',
+      produces='text/plain')
+def get_metrics():
+    """Endpoint to get metrics, in Prometheus text format.
+
+    :returns: ``text/plain``
+    """
+    response = make_response(stick.get_metrics(), 200)
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    return response
+
+
 @smrt('/devices',
       produces='application/se.novafaen.stick.devices.v1+json')
 def get_devices():
@@ -87,15 +397,9 @@ def get_devices():
 
     :returns: ``se.novafaen.stick.devices.v1+json``
     """
-    sticks = stick.get_devices()
+    body, etag = stick.get_devices_document()
 
-    body = {
-        'devices': [stick.json() for stick in sticks]
-    }
-
-    response = make_response(jsonify(body), 200)
-    response.headers['Content-Type'] = 'application/se.novafaen.stick.devices.v1+json'
-    return response
+    return _conditional(body, etag, 'application/se.novafaen.stick.devices.v1+json')
 
 
 @smrt('/device/<string:name>',
@@ -110,10 +414,20 @@ def get_device(name):
     if device is None:
         raise ResouceNotFound('Could not find device \'{}\''.format(name))
 
-    body = device.json()
+    body, etag = stick.get_device_document(device)
 
-    response = make_response(jsonify(body), 200)
-    response.headers['Content-Type'] = 'application/se.novafaen.prism.light.v1+json'
+    return _conditional(body, etag, 'application/se.novafaen.prism.light.v1+json')
+
+
+def _conditional(body, etag, content_type):
+    """Create response, or ``304 Not Modified`` if caller already has etag."""
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(body, 200)
+        response.headers['Content-Type'] = content_type
+
+    response.set_etag(etag)
     return response
 
 
@@ -150,12 +464,78 @@ def power_toggle(name):
     return _toggle(name)
 
 
+@smrt('/events',
+      produces='application/se.novafaen.stick.events.v1+json')
+def get_events():
+    """Endpoint to long-poll device events.
+
+    Query ``cursor`` is the last cursor seen, without it only latest cursor
+    is returned. Cursors are opaque and only valid against the process that
+    gave them. Request waits up to ``timeout`` seconds (default 30, max 60)
+    for new events. If ``reset`` is true events were lost, or cursor is from
+    another process or before a restart, and caller should get ``/devices``
+    again and continue from returned cursor. A waiting request holds a server
+    worker thread, or only a greenlet with gevent workers.
+
+    :returns: ``application/se.novafaen.stick.events.v1+json``
+    """
+    try:
+        cursor = request.args.get('cursor')
+        timeout = min(float(request.args.get('timeout', EVENTS_TIMEOUT)), EVENTS_MAX_TIMEOUT)
+    except ValueError:
+        return _bad_request('"timeout" must be a number')
+
+    body = stick.get_events(cursor, max(0.0, timeout))
+
+    response = make_response(jsonify(body), 200)
+    response.headers['Content-Type'] = 'application/se.novafaen.stick.events.v1+json'
+    return response
+
+
+@smrt('/jobs/<string:id>',
+      produces='application/se.novafaen.stick.job.v1+json')
+def get_job(id):
+    """Endpoint to get status of a background power job.
+
+    :returns: ``application/se.novafaen.stick.job.v1+json``
+    """
+    job = stick.get_job(id)
+
+    if job is None:
+        raise ResouceNotFound('Could not find job \'{}\''.format(id))
+
+    response = make_response(jsonify(job), 200)
+    response.headers['Content-Type'] = 'application/se.novafaen.stick.job.v1+json'
+    return response
+
+
+def _wants_async():
+    """Check if caller opted in to background power commands.
+
+    Opt in with header ``Prefer: respond-async`` or query ``?async=true``.
+    """
+    return 'respond-async' in request.headers.get('Prefer', '') or \
+        request.args.get('async', '').lower() in ('1', 'true')
+
+
+def _accepted(device, on_off):
+    job = stick.set_power_async(device, on_off)
+
+    response = make_response(jsonify(job), 202)
+    response.headers['Content-Type'] = 'application/se.novafaen.stick.job.v1+json'
+    response.headers['Location'] = '/jobs/%s' % job['id']
+    return response
+
+
 def _toggle(name):
     device = stick.get_device(name)
 
     if device is None:
         raise ResouceNotFound('Could not find device \'%s\'' % name)
 
+    if _wants_async():
+        return _accepted(device, device.toggled_power())
+
     device.toggle_power()
 
     response = make_response(jsonify(device.json()), 200)
@@ -171,8 +551,170 @@ def _power(name, on_off):
 
     log.debug('[stick] setting device "%s" power to %s', name, on_off)
 
+    if _wants_async():
+        return _accepted(device, on_off)
+
     device.set_power(on_off)
 
     response = make_response(jsonify(''), 204)
     response.headers['Content-Type'] = 'application/se.novafaen.stick.device.v1+json'
     return response
+
+
+@smrt('/devices/power',
+      methods=['PUT'],
+      produces='application/se.novafaen.stick.power.v1+json')
+def power_many():
+    """Endpoint to set power for several devices, by name and/or group.
+
+    Body is ``{"devices": [name], "group": name, "power": "on"|"off"|"toggle"}``,
+    at least one of ``devices`` and ``group`` is required.
+
+    :returns: ``application/se.novafaen.stick.power.v1+json``
+    """
+    body = request.get_json(silent=True)
+
+    error = _power_body_error(body)
+    if error is not None:
+        return _bad_request(error)
+
+    names = body.get('devices', [])
+
+    if 'group' in body:
+        group = stick.get_group(body['group'])
+        if group is None:
+            raise ResouceNotFound('Could not find group \'{}\''.format(body['group']))
+        names = names + group
+
+    if not names:
+        return _bad_request('Body must contain "devices" and/or "group"')
+
+    names = list(dict.fromkeys(names))  # remove duplicates, keep order
+
+    log.debug('[stick] setting power %s for %i devices', body['power'], len(names))
+
+    results = stick.set_power_many(names, body['power'])
+
+    response = make_response(jsonify({'devices': results}), 200)
+    response.headers['Content-Type'] = 'application/se.novafaen.stick.power.v1+json'
+    return response
+
+
+@smrt('/schedules',
+      methods=['POST'],
+      produces='application/se.novafaen.stick.schedule.v1+json')
+def create_schedule():
+    """Endpoint to schedule a timed or recurring power action.
+
+    Body is ``{"devices": [name], "group": name, "power": "on"|"off"|"toggle",
+    "at": unix time, "every": seconds}``, at least one of ``devices`` and
+    ``group``, and of ``at`` and ``every``, is required. Without ``every``
+    action runs once at ``at``, without ``at`` it first runs after ``every``.
+
+    :returns: ``application/se.novafaen.stick.schedule.v1+json``
+    """
+    body = request.get_json(silent=True)
+
+    error = _power_body_error(body)
+    if error is not None:
+        return _bad_request(error)
+
+    if not body.get('devices') and 'group' not in body:
+        return _bad_request('Body must contain "devices" and/or "group"')
+
+    if 'group' in body and stick.get_group(body['group']) is None:
+        raise ResouceNotFound('Could not find group \'{}\''.format(body['group']))
+
+    at, every = body.get('at'), body.get('every')
+    if at is None and every is None:
+        return _bad_request('Body must contain "at" and/or "every"')
+    if not all(value is None or (isinstance(value, (int, float)) and not isinstance(value, bool))
+               for value in (at, every)):
+        return _bad_request('"at" and "every" must be numbers')
+    action = {'power': body['power']}
+    for key in ('devices', 'group'):
+        if key in body:
+            action[key] = body[key]
+
+    try:
+        schedule = stick.add_schedule(action, at, every)
+    except ValueError as err:
+        return _bad_request(str(err))
+
+    if schedule is None:
+        return _bad_request('Too many schedules')
+
+    response = make_response(jsonify(schedule), 201)
+    response.headers['Content-Type'] = 'application/se.novafaen.stick.schedule.v1+json'
+    response.headers['Location'] = '/schedules/%s' % schedule['id']
+    return response
+
+
+@smrt('/schedules',
+      produces='application/se.novafaen.stick.schedules.v1+json')
+def get_schedules():
+    """Endpoint to list scheduled power actions, earliest first.
+
+    :returns: ``application/se.novafaen.stick.schedules.v1+json``
+    """
+    response = make_response(jsonify({'schedules': stick.get_schedules()}), 200)
+    response.headers['Content-Type'] = 'application/se.novafaen.stick.schedules.v1+json'
+    return response
+
+
+@smrt('/schedules/<string:id>',
+      produces='application/se.novafaen.stick.schedule.v1+json')
+def get_schedule(id):
+    """Endpoint to get a scheduled power action.
+
+    :returns: ``application/se.novafaen.stick.schedule.v1+json``
+    """
+    schedule = stick.get_schedule(id)
+
+    if schedule is None:
+        raise ResouceNotFound('Could not find schedule \'{}\''.format(id))
+
+    response = make_response(jsonify(schedule), 200)
+    response.headers['Content-Type'] = 'application/se.novafaen.stick.schedule.v1+json'
+    return response
+
+
+@smrt('/schedules/<string:id>',
+      methods=['DELETE'],
+      produces='application/se.novafaen.stick.schedule.v1+json')
+def delete_schedule(id):
+    """Endpoint to delete a scheduled power action.
+
+    :returns: ``application/se.novafaen.stick.schedule.v1+json``
+    """
+    if not stick.delete_schedule(id):
+        raise ResouceNotFound('Could not find schedule \'{}\''.format(id))
+
+    response = make_response('', 204)
+    response.headers['Content-Type'] = 'application/se.novafaen.stick.schedule.v1+json'
+    return response
+
+
+def _power_body_error(body):
+    """Get error message if body has no valid ``power``, ``devices`` and ``group``, ``None`` if valid."""
+    if not isinstance(body, dict) or body.get('power') not in ('on', 'off', 'toggle'):
+        return 'Body must contain "power" with value "on", "off" or "toggle"'
+
+    names = body.get('devices', [])
+    if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+        return '"devices" must be a list of device names'
+
+    if not isinstance(body.get('group', ''), str):
+        return '"group" must be a group name'
+
+    return None
+
+
+def _bad_request(message):
+    body = {
+        'status': 'BadRequest',
+        'message': message
+    }
+    response = make_response(jsonify(body), 400)
+    response.headers['Content-Type'] = 'application/se.novafaen.smrt.error.v1+json'
+    return response
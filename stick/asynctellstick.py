@@ -0,0 +1,255 @@
+"""Tellstick local API client on asyncio.
+
+Alternative to ``Tellstick`` for callers running an event loop, the stick
+application does not use it. Only device listing and power commands are
+made on the event loop. Discovery, authorization, token refresh, retry
+policy and circuit breaker are those of a ``Tellstick`` kept for this, so
+both clients behave the same towards the Tellstick.
+"""
+
+from threading import Thread
+import asyncio
+import logging as loggr
+
+from stick.asynctransport import CALL_ERRORS, AsyncTransport
+from stick.breaker import CircuitOpenError
+from stick.commandqueue import CommandQueue
+from stick.onoffdevice import OnOffDevice
+from stick.registry import DeviceRegistry
+from stick.tellstick import SUPPORTED_METHODS, Tellstick
+
+log = loggr.getLogger('smrt')
+
+ASYNC_TRANSPORT_OPTIONS = ('pool_size', 'connect_timeout', 'read_timeout')
+
+
+class AsyncTellstick:
+    """Tellstick Local API implementation on asyncio, mirrors ``Tellstick``.
+
+    Discovery, authorization and token refresh are blocking and done by a
+    ``Tellstick``, in the default executor. All device calls towards the
+    Tellstick are made on the event loop, so any number of device
+    operations can be in flight without one thread each.
+
+    Devices returned have no client of their own unless wrapped by
+    ``BlockingTellstick``, use ``set_power`` and ``toggle_power`` on the
+    client to control them.
+    """
+
+    def __init__(self, username, password, address=None, transport=None, **options):
+        """Create AsyncTellstick, discovery and authorization is done on first call.
+
+        :param username: ``String`` tellstick username
+        :param password: ``String`` tellstick password
+        :param address: ``String`` tellstick address, discovered if omitted
+        :param transport: ``Dict`` options for ``Transport``, and ``AsyncTransport`` where applicable
+        :param options: options for ``Tellstick`` doing authorization, e.g. ``state_file``,
+                        and ``commands`` with ``retries`` and ``retry_backoff``
+        """
+        transport = transport or {}
+        self._tellstick = Tellstick(username, password, address=address, transport=transport,
+                                    reconcile={'enabled': False}, **options)
+        self._registry = DeviceRegistry()
+        self._device_client = None  # client handed to created devices
+
+        self._transport = AsyncTransport(address, breaker=self._tellstick.breaker,
+                                         **{key: value for key, value in transport.items()
+                                            if key in ASYNC_TRANSPORT_OPTIONS})
+
+    async def _authorized(self):
+        """Discover and authorize if needed, and use address and token of ``Tellstick``.
+
+        :returns: ``Boolean`` if discovered and authorized
+        """
+        credentials = self._tellstick.credentials
+        if credentials is None:
+            await self._in_executor(self._tellstick.authorized)
+            credentials = self._tellstick.credentials
+            if credentials is None:
+                return False
+
+        address, bearer = credentials
+        self._transport.set_address(address)
+        self._transport.set_bearer(bearer)
+        return True
+
+    @staticmethod
+    async def _in_executor(function, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+    async def get_devices(self):
+        """Get list of ``OnOffDevice`` connected to tellstick.
+
+        :returns: ``[OnOffDevice]``
+        """
+        try:
+            if not await self._authorized():
+                log.warning('Cannot return any devices, stick is not authenticated and autorized against tellstick')
+                return self._registry.devices()  # return cached values
+
+            response = await self._transport.get('/api/devices/list', params={'supportedMethods': SUPPORTED_METHODS})
+        except (CircuitOpenError,) + CALL_ERRORS as err:
+            log.debug('failed to get devices, returning cached device list: %s', err)
+            return self._registry.devices()  # return cached values
+
+        if response.status_code != 200:
+            log.debug('failed to get devices, returning cached device list')
+            await self._in_executor(self._tellstick.call_failed, response.status_code, 0)
+            return self._registry.devices()  # return cached values
+
+        try:
+            raw_devices = response.json()['device']
+        except (ValueError, KeyError) as err:
+            log.warning('Failed to parse response from tellstick: %s', err)
+            return self._registry.devices()  # return cached values
+
+        log.debug('discovered %i devices', len(raw_devices))
+
+        self._registry.update(raw_devices,
+                              lambda raw_device: OnOffDevice(raw_device['name'], raw_device, self._device_client))
+
+        return self._registry.devices()
+
+    async def get_device(self, name):
+        """Get ``OnOffDevice`` by name.
+
+        :param name: ``String`` identifier.
+        :returns: ``OnOffDevice`` or ``None``
+        """
+        if name not in self._registry:
+            await self.get_devices()  # re-discover
+
+        return self._registry.get(name)
+
+    async def power(self, id, on_off):
+        """Set power for device with Id.
+
+        Failed commands are retried, and token refreshed, as by ``Tellstick.power``.
+
+        :param id: ``String`` telldus device id
+        :param on_off: ``Boolean`` power state
+        :returns: ``Boolean`` if action was successful
+        """
+        power_action = 'turnOn' if on_off else 'turnOff'
+
+        for attempt in range(1 + self._tellstick.retries):
+            if attempt > 0:
+                await asyncio.sleep(self._tellstick.retry_delay(attempt))
+
+            try:
+                if not await self._authorized():
+                    return False
+
+                response = await self._transport.get('/api/device/%s' % power_action, params={'id': id})
+            except CircuitOpenError as err:
+                if not await self._in_executor(self._tellstick.rediscover):
+                    log.debug('tellstick action %s not sent: %s', id, err)
+                    return False
+                continue
+            except CALL_ERRORS as err:
+                log.debug('tellstick action %s failed, attempt=%i: %s', id, attempt, err)
+                if isinstance(err, ConnectionError):
+                    await self._in_executor(self._tellstick.rediscover)
+                continue
+
+            if response.status_code == 200:
+                break
+
+            log.debug('call state was not successful (%s)', response.status_code)
+
+            if not await self._in_executor(self._tellstick.call_failed, response.status_code, attempt):
+                return False
+        else:
+            return False
+
+        try:
+            status = response.json()['status']
+        except (ValueError, KeyError) as err:
+            log.warning('Failed to parse response from tellstick: %s', err)
+            return False
+
+        log.debug('tellstick action %s, code=%s, status=%s', id, response.status_code, status)
+        return status == 'success'
+
+    async def power_many(self, commands):
+        """Set power for several devices concurrently.
+
+        Concurrency towards the Tellstick is bounded by transport pool size.
+
+        :param commands: ``[(id, on_off)]``
+        :returns: ``[Boolean]`` result per command, in same order
+        """
+        return await asyncio.gather(*(self.power(id, on_off) for id, on_off in commands))
+
+    async def set_power(self, device, on_off):
+        """Set power state for device, see ``OnOffDevice.set_power``.
+
+        :param device: ``OnOffDevice``
+        :param on_off: ``Boolean`` power state
+        :returns: ``Boolean`` if action was successful
+        """
+        successful = await self.power(device.get_id(), on_off)
+        return device.update_power(on_off, successful)
+
+    async def toggle_power(self, device):
+        """Toggle power for device, see ``OnOffDevice.toggle_power``.
+
+        :param device: ``OnOffDevice``
+        :returns: ``Boolean`` if action was successful
+        """
+        power = device.json()['power']
+        return await self.set_power(device, True if power is None else not power)  # turn on if unknown
+
+    async def close(self):
+        """Stop token refresh and close connections."""
+        self._tellstick.close()
+        await self._transport.close()
+
+
+class BlockingTellstick:
+    """Synchronous wrapper around ``AsyncTellstick``.
+
+    Event loop runs in a daemon thread, calls block until their coroutine
+    completes. Devices returned can be used with ``set_power`` and
+    ``toggle_power`` directly, as with ``Tellstick``. Only device listing
+    and power is offered, it has no device cache nor stats, and cannot
+    replace ``Tellstick`` in the stick application.
+    """
+
+    def __init__(self, tellstick, commands=None):
+        """Create BlockingTellstick and start event loop thread.
+
+        :param tellstick: ``AsyncTellstick`` to wrap
+        :param commands: ``Dict`` options for ``CommandQueue`` used by devices
+        """
+        self._tellstick = tellstick
+        self._tellstick._device_client = CommandQueue(self.power, **(commands or {}))
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = Thread(target=self._loop.run_forever, name='tellstick-loop', daemon=True)
+        self._thread.start()
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def get_devices(self):
+        """See ``AsyncTellstick.get_devices``."""
+        return self._run(self._tellstick.get_devices())
+
+    def get_device(self, name):
+        """See ``AsyncTellstick.get_device``."""
+        return self._run(self._tellstick.get_device(name))
+
+    def power(self, id, on_off):
+        """See ``AsyncTellstick.power``."""
+        return self._run(self._tellstick.power(id, on_off))
+
+    def power_many(self, commands):
+        """See ``AsyncTellstick.power_many``."""
+        return self._run(self._tellstick.power_many(commands))
+
+    def close(self):
+        """Close client and stop event loop thread."""
+        self._run(self._tellstick.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
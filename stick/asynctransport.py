@@ -0,0 +1,246 @@
+"""Pooled keep-alive asyncio HTTP transport for the Tellstick local API.
+
+Tellstick local API is plain HTTP/1.1 with small JSON bodies, so a minimal
+client on top of asyncio streams is enough, no extra dependency needed.
+It only handles what the Tellstick answers, responses with content length,
+chunked or delimited by connection close, and is not a general HTTP client.
+"""
+
+from urllib.parse import urlencode
+import asyncio
+import json
+import logging as loggr
+
+from stick.breaker import CircuitBreaker
+
+log = loggr.getLogger('smrt')
+
+CALL_ERRORS = (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError)  # call failed, tellstick may be offline
+
+
+class AsyncResponse:
+    """AsyncResponse, status and body of a completed call."""
+
+    def __init__(self, status_code, body):
+        """Create AsyncResponse.
+
+        :param status_code: ``Integer`` http status code
+        :param body: ``bytes`` response body
+        """
+        self.status_code = status_code
+        self.content = body
+
+    @property
+    def text(self):
+        """Get body decoded as text."""
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        """Get body parsed as json.
+
+        :returns: parsed json
+        :raises ValueError: if body is not valid json
+        """
+        return json.loads(self.content)
+
+
+class AsyncTransport:
+    """AsyncTransport, asyncio counterpart of ``Transport``.
+
+    Keeps up to ``pool_size`` connections open. Calls beyond that wait for
+    a free connection, which bounds concurrency towards the Tellstick. Calls
+    are guarded by a circuit breaker, as with ``Transport``.
+    """
+
+    def __init__(self, address=None, pool_size=10, connect_timeout=3.05, read_timeout=10, breaker=None):
+        """Create and initialize AsyncTransport.
+
+        :param address: ``String`` tellstick ``host[:port]``, can be set later
+        :param pool_size: ``Integer`` max number of concurrent connections
+        :param connect_timeout: ``Float`` seconds to wait for connection
+        :param read_timeout: ``Float`` seconds to wait for response
+        :param breaker: ``CircuitBreaker`` to use, e.g. shared with a ``Transport`` to same tellstick
+        """
+        self._address = address
+        self._breaker = breaker or CircuitBreaker()
+        self._connect_timeout = connect_timeout
+        self._read_timeout = read_timeout
+        self._headers = {}
+        self._idle = []  # kept-alive (reader, writer) pairs
+        self._pool_size = pool_size
+        self._slots = None  # created on first call, must belong to running loop
+
+    @property
+    def timeout(self):
+        """Get ``(connect, read)`` timeout tuple used for calls.
+
+        :returns: ``Tuple``
+        """
+        return self._connect_timeout, self._read_timeout
+
+    @property
+    def breaker(self):
+        """Get circuit breaker guarding calls.
+
+        :returns: ``CircuitBreaker``
+        """
+        return self._breaker
+
+    def set_address(self, address):
+        """Set tellstick address used for all calls.
+
+        :param address: ``String`` tellstick address
+        """
+        self._address = address
+
+    def set_bearer(self, bearer):
+        """Set bearer token sent with all calls.
+
+        :param bearer: ``String`` token, or ``None`` to remove
+        """
+        if bearer is None:
+            self._headers.pop('Authorization', None)
+        else:
+            self._headers['Authorization'] = 'Bearer %s' % bearer
+
+    async def get(self, path, params=None):
+        """Perform GET against tellstick api.
+
+        :param path: ``String`` api path
+        :param params: ``Dict`` query parameters
+        :returns: ``AsyncResponse``
+        """
+        return await self.request('GET', path, params=params)
+
+    async def put(self, path, params=None, data=None):
+        """Perform PUT against tellstick api, see ``get``."""
+        return await self.request('PUT', path, params=params, data=data)
+
+    async def post(self, path, params=None, data=None):
+        """Perform POST against tellstick api, see ``get``."""
+        return await self.request('POST', path, params=params, data=data)
+
+    async def request(self, method, path, params=None, data=None):
+        """Perform call against tellstick api.
+
+        A kept-alive connection is reused when available. If a reused
+        connection turns out to be closed by the Tellstick, call is retried
+        once on a new connection.
+
+        :param method: ``String`` http method
+        :param path: ``String`` api path
+        :param params: ``Dict`` query parameters
+        :param data: ``Dict`` form data
+        :returns: ``AsyncResponse``
+        :raises CircuitOpenError: if breaker is open, no call is made
+        """
+        target = path if not params else '%s?%s' % (path, urlencode(params))
+        body = urlencode(data).encode('utf-8') if data else b''
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._pool_size)
+
+        async with self._slots:
+            self._breaker.before_call()
+            try:
+                response = await self._reused_or_new(method, target, body)
+            except BaseException as err:  # also cancelled or unparsable, a probe must always report back
+                self._breaker.failure(err)
+                raise
+
+        if response.status_code >= 500:
+            self._breaker.failure('%s %s answered %s' % (method, path, response.status_code))
+        else:
+            self._breaker.success()
+
+        return response
+
+    async def _reused_or_new(self, method, target, body):
+        reused = bool(self._idle)
+        try:
+            return await self._exchange(method, target, body)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            if not reused:
+                raise
+            log.debug('kept-alive connection was closed, retrying on new connection')
+            return await self._exchange(method, target, body)
+
+    async def close(self):
+        """Close all kept-alive connections."""
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+    async def _exchange(self, method, target, body):
+        reader, writer = await self._connection()
+
+        headers = dict(self._headers)
+        headers['Host'] = self._address
+        headers['Content-Length'] = str(len(body))
+        if body:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+
+        head = '%s %s HTTP/1.1\r\n%s\r\n' % (
+            method, target, ''.join('%s: %s\r\n' % item for item in headers.items()))
+
+        try:
+            writer.write(head.encode('latin-1') + body)
+            await writer.drain()
+            status_code, keep_alive, content = await asyncio.wait_for(self._read_response(reader),
+                                                                      self._read_timeout)
+        except BaseException:
+            writer.close()
+            raise
+
+        if keep_alive:
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+
+        return AsyncResponse(status_code, content)
+
+    async def _connection(self):
+        if self._idle:
+            return self._idle.pop()
+
+        host, _, port = self._address.partition(':')
+        return await asyncio.wait_for(asyncio.open_connection(host, int(port or 80)),
+                                      self._connect_timeout)
+
+    @staticmethod
+    async def _read_response(reader):
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError('connection closed by tellstick')
+
+        version, status_code = status_line.decode('latin-1').split()[:2]
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            headers[key.strip().lower()] = value.strip()
+
+        status_code = int(status_code)
+
+        if status_code < 200 or status_code in (204, 304):
+            content = b''  # never has a body
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            content = b''
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                chunk = await reader.readexactly(size + 2)  # chunk and trailing crlf
+                if size == 0:
+                    break
+                content += chunk[:-2]
+        elif 'content-length' in headers:
+            content = await reader.readexactly(int(headers['content-length']))
+        else:
+            content = await reader.read()  # delimited by connection close
+            headers['connection'] = 'close'
+
+        keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+
+        return status_code, keep_alive, content
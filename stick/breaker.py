@@ -0,0 +1,123 @@
+"""Circuit breaker for calls to a Tellstick that may be offline."""
+
+from collections import deque
+from threading import Lock
+import logging as loggr
+import time
+
+log = loggr.getLogger('smrt')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+FAILURE_THRESHOLD = 5  # consecutive failures before breaker opens
+RESET_TIMEOUT = 30  # seconds breaker stays open before a probe is let through
+RECENT_FAILURES = 10
+
+
+class CircuitOpenError(RuntimeError):
+    """Call rejected without being made, breaker is open."""
+
+
+class CircuitBreaker:
+    """CircuitBreaker, fails fast while the other end is unreachable.
+
+    Closed, calls go through and consecutive failures are counted. After
+    ``failure_threshold`` failures the breaker opens and calls are rejected
+    right away. After ``reset_timeout`` seconds it is half open and lets one
+    probe call through, which closes the breaker if it succeeds or opens it
+    again if it fails. A probe that never reports back, e.g. cancelled, is
+    given up after another ``reset_timeout`` and a new probe let through.
+    """
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        """Create closed CircuitBreaker.
+
+        :param failure_threshold: ``Integer`` consecutive failures before opening
+        :param reset_timeout: ``Float`` seconds open before probing
+        """
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+
+        self._lock = Lock()
+        self._state = CLOSED
+        self._failures = 0  # consecutive
+        self._opened_at = None
+        self._probing = False
+        self._probe_started = None
+        self._times_opened = 0
+        self._recent_failures = deque(maxlen=RECENT_FAILURES)
+
+    @property
+    def state(self):
+        """Get breaker state, ``CLOSED``, ``OPEN`` or ``HALF_OPEN``."""
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        """Get state, open turns half open after reset timeout, must hold lock."""
+        now = time.monotonic()
+        if self._state == OPEN and now - self._opened_at >= self._reset_timeout:
+            self._state = HALF_OPEN
+            self._probing = False
+        elif self._state == HALF_OPEN and self._probing and now - self._probe_started >= self._reset_timeout:
+            log.debug('circuit breaker probe did not report back, letting another through')
+            self._probing = False
+        return self._state
+
+    def before_call(self):
+        """Check that a call may be made.
+
+        :raises CircuitOpenError: if breaker is open, or half open with a probe already running
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True
+                self._probe_started = time.monotonic()
+                log.debug('circuit breaker half open, probing')
+                return
+
+        raise CircuitOpenError('tellstick unavailable, circuit breaker is open')
+
+    def success(self):
+        """Record successful call, closes breaker."""
+        with self._lock:
+            if self._state != CLOSED:
+                log.info('circuit breaker closed, tellstick is available again')
+            self._state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def failure(self, error):
+        """Record failed call, opens breaker at threshold or when probe fails.
+
+        :param error: description of failure
+        """
+        with self._lock:
+            self._failures += 1
+            self._recent_failures.append({'time': int(time.time()), 'error': str(error)})
+
+            if self._state == HALF_OPEN or self._failures >= self._failure_threshold:
+                if self._state != OPEN:
+                    self._times_opened += 1
+                    log.warning('circuit breaker open after %i failures, last: %s', self._failures, error)
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def stats(self):
+        """Get breaker state and recent failures.
+
+        :returns: ``Dict``
+        """
+        with self._lock:
+            return {
+                'state': self._current_state(),
+                'consecutive_failures': self._failures,
+                'times_opened': self._times_opened,
+                'recent_failures': list(self._recent_failures)
+            }
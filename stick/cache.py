@@ -0,0 +1,182 @@
+"""Caches used in front of Tellstick calls."""
+
+from collections import OrderedDict
+from threading import Event, Lock, Thread
+import logging as loggr
+import time
+
+log = loggr.getLogger('smrt')
+
+
+class RefreshingCache:
+    """RefreshingCache, holds one value with time-to-live and stale-while-revalidate.
+
+    Within ``ttl`` the value is returned from memory. After ``ttl`` the stale
+    value is still returned while one background refresh runs. Concurrent
+    loads, both misses and refreshes, are coalesced into one loader call.
+    """
+
+    def __init__(self, loader, ttl):
+        """Create RefreshingCache.
+
+        :param loader: ``Callable`` returning value, or ``None`` if load failed
+        :param ttl: ``Float`` seconds a loaded value is fresh
+        """
+        self._loader = loader
+        self._ttl = ttl
+
+        self._value = None
+        self._loaded_at = None  # never loaded
+        self._loading = None  # ``Event`` while a load is in progress
+
+        self._lock = Lock()
+        self._hits = 0
+        self._stale_hits = 0
+        self._misses = 0
+        self._loads = 0
+
+    def get(self):
+        """Get value, load if never loaded.
+
+        :returns: cached value, ``None`` if never successfully loaded
+        """
+        with self._lock:
+            if self._loaded_at is not None:
+                if time.monotonic() - self._loaded_at < self._ttl:
+                    self._hits += 1
+                    return self._value
+
+                self._stale_hits += 1
+                if self._loading is None:
+                    self._loading = Event()
+                    Thread(target=self._load_in_background, args=(self._loading,),
+                           name='cache-refresh', daemon=True).start()
+                return self._value
+
+            self._misses += 1
+
+        return self.refresh()
+
+    def refresh(self):
+        """Load value now, waits for an already running load instead of starting another.
+
+        :returns: loaded value, or previous value if load failed
+        """
+        with self._lock:
+            loading = self._loading
+            if loading is None:
+                loading = self._loading = Event()
+                leader = True
+            else:
+                leader = False
+
+        if leader:
+            self._load(loading)
+        else:
+            loading.wait()
+
+        return self._value
+
+    def invalidate(self):
+        """Mark value as stale, next ``get`` triggers refresh."""
+        with self._lock:
+            if self._loaded_at is not None:
+                self._loaded_at = float('-inf')  # keep value for stale reads
+
+    def stats(self):
+        """Get cache counters.
+
+        :returns: ``Dict``
+        """
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'stale_hits': self._stale_hits,
+                'misses': self._misses,
+                'loads': self._loads
+            }
+
+    def _load_in_background(self, loading):
+        try:
+            self._load(loading)
+        except Exception:  # already logged, stale value is kept
+            pass
+
+    def _load(self, loading):
+        try:
+            value = self._loader()
+            with self._lock:
+                self._loads += 1
+                if value is not None:
+                    self._value = value
+                    self._loaded_at = time.monotonic()
+        except Exception as err:
+            log.warning('failed to load cache value: %s', err)
+            raise
+        finally:
+            with self._lock:
+                self._loading = None
+            loading.set()
+
+
+class NegativeCache:
+    """NegativeCache, remembers keys that were looked up and not found.
+
+    Bounded in size, least recently added key is evicted first, and each key
+    expires after ``ttl`` seconds.
+    """
+
+    def __init__(self, ttl, max_size):
+        """Create NegativeCache.
+
+        :param ttl: ``Float`` seconds a key is remembered
+        :param max_size: ``Integer`` max number of keys remembered
+        """
+        self._ttl = ttl
+        self._max_size = max_size
+        self._expiries = OrderedDict()
+
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def __contains__(self, key):
+        """Check if key is known to be missing."""
+        with self._lock:
+            expiry = self._expiries.get(key)
+            if expiry is not None and expiry > time.monotonic():
+                self._hits += 1
+                return True
+
+            if expiry is not None:
+                del self._expiries[key]
+            self._misses += 1
+            return False
+
+    def add(self, key):
+        """Remember key as missing.
+
+        :param key: key that was not found
+        """
+        with self._lock:
+            self._expiries.pop(key, None)
+            self._expiries[key] = time.monotonic() + self._ttl
+            while len(self._expiries) > self._max_size:
+                self._expiries.popitem(last=False)
+
+    def clear(self):
+        """Forget all keys, e.g. when new entries have been discovered."""
+        with self._lock:
+            self._expiries.clear()
+
+    def stats(self):
+        """Get cache counters.
+
+        :returns: ``Dict``
+        """
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'size': len(self._expiries)
+            }
@@ -0,0 +1,173 @@
+"""Several Tellsticks behind one client."""
+
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+import logging as loggr
+import time
+
+from stick.state import StateFile
+from stick.tellstick import REDISCOVERY_INTERVAL, Tellstick, discover_tellsticks
+
+log = loggr.getLogger('smrt')
+
+
+class TellstickCluster:
+    """TellstickCluster, one authorized ``Tellstick`` client per controller.
+
+    Has the same interface as ``Tellstick``. Listings run on all controllers
+    in parallel and are merged by name, first controller wins if a name
+    exists on several. Every device sends its commands through the
+    controller it was listed by.
+
+    Controllers are given by address, or discovered on first use. Discovered
+    addresses are persisted to state file, if any, and reused on restart. If
+    no controller answers, discovery is retried at most once per
+    ``REDISCOVERY_INTERVAL``, and until then there are no clients.
+    """
+
+    def __init__(self, username, password, addresses=None, state_file=None, **options):
+        """Create TellstickCluster, no calls are made until first use.
+
+        :param username: ``String`` tellstick username
+        :param password: ``String`` tellstick password
+        :param addresses: ``[String]`` tellstick addresses, discovered if omitted
+        :param state_file: ``String`` path where addresses are persisted, each
+                           controller persists its token next to it
+        :param options: passed on to each ``Tellstick``
+        """
+        self._username = username
+        self._password = password
+        self._state_file_path = state_file
+        self._state_file = StateFile(state_file) if state_file is not None else None
+        self._options = options
+
+        self._clients = None
+        self._clients_lock = Lock()
+        self._discovered_at = None
+        self._executor = None
+
+        if addresses is None and self._state_file is not None:
+            addresses = self._state_file.load().get('addresses')
+
+        if addresses:
+            self._create_clients(addresses)
+
+    def clients(self):
+        """Get client per controller, discovers controllers on first call.
+
+        :returns: ``[Tellstick]``, empty if no controller answered discovery
+        """
+        if self._clients is None:
+            with self._clients_lock:
+                if self._clients is None:
+                    now = time.monotonic()
+                    if self._discovered_at is not None and now - self._discovered_at < REDISCOVERY_INTERVAL:
+                        return []
+                    self._discovered_at = now
+
+                    addresses = discover_tellsticks()
+                    if not addresses:
+                        log.warning('no tellstick answered discovery')
+                        return []
+
+                    if self._state_file is not None:
+                        self._state_file.save({'addresses': addresses})
+
+                    self._create_clients(addresses)
+
+        return self._clients
+
+    def _create_clients(self, addresses):
+        clients = []
+        for address in addresses:
+            options = dict(self._options)
+            suffix = address.replace(':', '_')
+            if self._state_file_path is not None:
+                options['state_file'] = '%s.%s' % (self._state_file_path, suffix)
+            if options.get('shared_state') is not None:
+                options['shared_state'] = '%s.%s' % (options['shared_state'], suffix)
+            clients.append(Tellstick(self._username, self._password, address=address, **options))
+
+        self._executor = ThreadPoolExecutor(max_workers=len(clients), thread_name_prefix='tellstick-cluster')
+        self._clients = clients
+
+    def _each(self, call):
+        """Call function with every client in parallel.
+
+        :returns: ``[result]`` in client order
+        """
+        clients = self.clients()
+        if len(clients) <= 1:
+            return [call(client) for client in clients]
+        return list(self._executor.map(call, clients))
+
+    def get_devices(self):
+        """Get merged list of ``OnOffDevice`` from all controllers, see ``Tellstick.get_devices``.
+
+        :returns: ``[OnOffDevice]``
+        """
+        merged = {}
+        for devices in self._each(lambda client: client.get_devices()):
+            for device in devices:
+                merged.setdefault(device.get_name(), device)
+
+        return list(merged.values())
+
+    def get_device(self, name):
+        """Get ``OnOffDevice`` by name, see ``get_devices_by_name``.
+
+        :param name: ``String`` identifier.
+        :returns: ``OnOffDevice`` or ``None``
+        """
+        return self.get_devices_by_name([name])[name]
+
+    def get_devices_by_name(self, names):
+        """Get several ``OnOffDevice`` by name.
+
+        Names already discovered are routed to their controller directly.
+        Only unknown names are looked up on all controllers, in parallel.
+
+        :param names: ``[String]`` identifiers.
+        :returns: ``Dict`` name to ``OnOffDevice`` or ``None``
+        """
+        clients = self.clients()
+        found = {name: next((device for device in (client.lookup(name) for client in clients)
+                             if device is not None), None)
+                 for name in names}
+
+        unknown = [name for name, device in found.items() if device is None]
+        if unknown:
+            for devices in self._each(lambda client: client.get_devices_by_name(unknown)):
+                for name in unknown:
+                    if found[name] is None:
+                        found[name] = devices[name]
+
+        return found
+
+    def registry_version(self):
+        """Get version of merged device registry, changes whenever any device changes.
+
+        :returns: ``Integer``
+        """
+        return sum(client.registry_version() for client in self._clients or [])
+
+    def command_stats(self):
+        """Get command queue counters per controller.
+
+        :returns: ``Dict``
+        """
+        return {client.address: client.command_stats() for client in self._clients or []}
+
+    def breaker_stats(self):
+        """Get circuit breaker state per controller.
+
+        :returns: ``Dict``
+        """
+        return {client.address: client.breaker_stats() for client in self._clients or []}
+
+    def cache_stats(self):
+        """Get cache counters per controller.
+
+        :returns: ``Dict``
+        """
+        return {client.address: client.cache_stats() for client in self._clients or []}
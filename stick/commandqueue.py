@@ -0,0 +1,188 @@
+"""Power command queue between ``OnOffDevice`` and ``Tellstick``."""
+
+from concurrent.futures import Future
+from itertools import count
+from threading import Condition, Thread
+import heapq
+import logging as loggr
+import time
+
+log = loggr.getLogger('smrt')
+
+INTERACTIVE = 0  # priority of requests from users
+AUTOMATION = 1  # priority of scheduled and bulk requests
+
+COMMAND_RATE = 5.0  # commands per second the transmitter can send
+
+
+class _Command:
+    """Pending power command for one device."""
+
+    __slots__ = ['on_off', 'priority', 'on_done', 'futures']
+
+    def __init__(self, on_off, priority, on_done):
+        self.on_off = on_off
+        self.priority = priority
+        self.on_done = on_done
+        self.futures = []
+
+
+class CommandQueue:
+    """CommandQueue, sends power commands one at a time at transmitter rate.
+
+    Each device has at most one pending command. A command submitted while
+    another is pending for the same device replaces it, so rapid on/off/on
+    only sends on. Pending commands are sent in priority order, interactive
+    before automation, and first come first served within a priority.
+    """
+
+    def __init__(self, send, rate=COMMAND_RATE, reserve=None):
+        """Create CommandQueue, dispatch thread is started on first submit.
+
+        :param send: ``Callable(id, on_off)`` sending command, returns ``Boolean`` success
+        :param rate: ``Float`` max commands per second
+        :param reserve: ``Callable(interval)`` reserving a send slot of a rate shared with
+                        queues of other processes, returns unix time of slot, see
+                        ``SharedState.reserve``, rate is per queue if omitted
+        """
+        self._send = send
+        self._interval = 1.0 / rate
+        self._reserve = reserve
+        self._reserved = False
+
+        self._pending = {}  # device id to _Command
+        self._done_at = {}  # device id to unix time last command was sent, inf while sending
+        self._ready = []  # heap of (priority, sequence, device id, _Command)
+        self._sequence = count()
+        self._next_send = 0.0
+
+        self._condition = Condition()
+        self._thread = None
+        self._sent = 0
+        self._coalesced = 0
+
+    def submit(self, id, on_off, priority=INTERACTIVE, on_done=None):
+        """Queue power command for device.
+
+        :param id: ``String`` telldus device id
+        :param on_off: ``Boolean`` power state
+        :param priority: ``INTERACTIVE`` or ``AUTOMATION``
+        :param on_done: ``Callable(on_off, successful)`` called with the state
+                        actually sent, before futures complete
+        :returns: ``Future`` resolving to ``Boolean`` success of the command
+                  that was sent, which may be a later command for same device
+        """
+        future = Future()
+
+        with self._condition:
+            command = self._pending.get(id)
+
+            if command is None:
+                command = self._pending[id] = _Command(on_off, priority, on_done)
+                heapq.heappush(self._ready, (priority, next(self._sequence), id, command))
+            else:
+                self._coalesced += 1
+                command.on_off = on_off
+                command.on_done = on_done or command.on_done
+                if priority < command.priority:
+                    command.priority = priority  # old heap entry becomes stale
+                    heapq.heappush(self._ready, (priority, next(self._sequence), id, command))
+
+            command.futures.append(future)
+
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name='tellstick-commands', daemon=True)
+                self._thread.start()
+
+            self._condition.notify()
+
+        return future
+
+    def power(self, id, on_off, priority=INTERACTIVE):
+        """Queue power command and wait for it to be sent, see ``submit``.
+
+        :returns: ``Boolean`` if action was successful
+        """
+        return self.submit(id, on_off, priority).result()
+
+    def is_pending(self, id):
+        """Check if device has a command waiting to be sent.
+
+        :param id: ``String`` telldus device id
+        :returns: ``Boolean``
+        """
+        return id in self._pending
+
+    def changed_since(self, id, since):
+        """Check if device has a command waiting, being sent, or sent after a time.
+
+        A listing requested before a command was sent may show device state
+        from before the command.
+
+        :param id: ``String`` telldus device id
+        :param since: ``Float`` unix time, e.g. when a listing was requested
+        :returns: ``Boolean``
+        """
+        return id in self._pending or self._done_at.get(id, 0) >= since
+
+    def stats(self):
+        """Get queue counters.
+
+        :returns: ``Dict``
+        """
+        with self._condition:
+            return {
+                'pending': len(self._pending),
+                'sent': self._sent,
+                'coalesced': self._coalesced
+            }
+
+    def _next_command(self):
+        with self._condition:
+            while True:
+                while not self._ready:
+                    self._condition.wait()
+
+                delay = self._next_send - time.monotonic()
+                if delay > 0:
+                    self._condition.wait(delay)  # rate limit, pick command afterwards to get latest
+                    continue
+
+                if self._reserve is not None and not self._reserved:
+                    slot = self._reserve(self._interval)
+                    self._reserved = True
+                    self._next_send = time.monotonic() + max(0.0, slot - time.time())
+                    continue
+
+                priority, _, id, command = heapq.heappop(self._ready)
+                if self._pending.get(id) is not command or command.priority != priority:
+                    continue  # stale entry, command was sent or re-prioritized
+
+                del self._pending[id]
+                self._done_at[id] = float('inf')
+                self._reserved = False
+                self._next_send = time.monotonic() + (0.0 if self._reserve is not None else self._interval)
+                self._sent += 1
+                return id, command
+
+    def _run(self):
+        while True:
+            id, command = self._next_command()
+
+            try:
+                successful = self._send(id, command.on_off)
+            except Exception as err:
+                log.warning('failed to send power command to device %s: %s', id, err)
+                successful = False
+
+            with self._condition:
+                self._done_at[id] = time.time()
+
+            if command.on_done is not None:
+                try:
+                    command.on_done(command.on_off, successful)
+                except Exception as err:
+                    log.warning('failed to update device %s after power command: %s', id, err)
+
+            for future in command.futures:
+                future.set_result(successful)
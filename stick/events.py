@@ -0,0 +1,103 @@
+"""Device change events, kept in a bounded in-memory log."""
+
+from collections import deque
+from threading import Condition
+import time
+import uuid
+
+EVENT_LOG_SIZE = 1024
+
+
+class EventLog:
+    """EventLog, ring buffer of device events addressed by cursor.
+
+    Every event gets the next cursor. Consumers pass the last cursor they
+    have seen to get newer events, and can wait for them. Cursors are
+    opaque, ``<instance>-<position>``, so a cursor from another process,
+    or from before a restart, is recognized and answered with a reset.
+
+    Subscribers cost nothing but the wait itself, the log is shared by all
+    of them and keeps nothing per subscriber. Under a greenlet based server,
+    e.g. gunicorn with gevent workers, a wait is a parked greenlet and
+    thousands of idle subscribers are cheap. Under a threaded WSGI server
+    each waiting request holds a worker thread.
+    """
+
+    def __init__(self, size=EVENT_LOG_SIZE, instance=None):
+        """Create EventLog.
+
+        :param size: ``Integer`` max number of events kept
+        :param instance: ``String`` identifies this log in cursors, random if omitted
+        """
+        self._events = deque(maxlen=size)
+        self._instance = instance or uuid.uuid4().hex[:8]
+        self._position = 0  # position of latest event
+        self._condition = Condition()
+
+    @property
+    def cursor(self):
+        """Get cursor of latest event.
+
+        :returns: ``String``
+        """
+        return self._cursor(self._position)
+
+    @property
+    def count(self):
+        """Get number of events appended since log was created.
+
+        :returns: ``Integer``
+        """
+        return self._position
+
+    def _cursor(self, position):
+        return '%s-%i' % (self._instance, position)
+
+    def _parse(self, cursor):
+        """Get position of cursor, ``None`` if cursor is not from this log."""
+        instance, _, position = str(cursor).rpartition('-')
+        if instance != self._instance or not position.isdigit():
+            return None
+        return int(position)
+
+    def append(self, event):
+        """Append event and wake up waiting consumers.
+
+        :param event: ``Dict`` event, ``cursor`` is added
+        """
+        with self._condition:
+            self._position += 1
+            event['cursor'] = self._cursor(self._position)
+            self._events.append(event)
+            self._condition.notify_all()
+
+    def since(self, cursor, timeout=0):
+        """Get events after cursor, wait up to timeout for one to arrive.
+
+        :param cursor: ``String`` last cursor seen by consumer
+        :param timeout: ``Float`` seconds to wait if there are no newer events
+        :returns: ``([Dict], String, Boolean)`` events, cursor to continue
+                  from, and if events were lost because cursor is too old, or
+                  is not from this log, e.g. given before a restart
+        """
+        deadline = time.monotonic() + timeout
+
+        with self._condition:
+            position = self._parse(cursor)
+            if position is None or position > self._position:
+                return [], self.cursor, True  # nothing to wait for
+
+            while self._position <= position:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            if self._position <= position:
+                return [], self.cursor, False
+
+            oldest = self._position - len(self._events) + 1
+            skip = max(0, position + 1 - oldest)
+            events = [self._events[i] for i in range(skip, len(self._events))]
+
+            return events, self.cursor, position + 1 < oldest
@@ -0,0 +1,74 @@
+"""Background power jobs, status of commands answered with 202 Accepted."""
+
+from collections import OrderedDict
+from threading import Lock
+import time
+import uuid
+
+PENDING = 'pending'
+COMPLETED = 'completed'
+ROLLED_BACK = 'rolled_back'
+
+MAX_JOBS = 1024
+
+
+class JobRegistry:
+    """JobRegistry, keeps status of the most recent power jobs.
+
+    Bounded in size, oldest jobs are forgotten first.
+    """
+
+    def __init__(self, max_jobs=MAX_JOBS):
+        """Create JobRegistry.
+
+        :param max_jobs: ``Integer`` max number of jobs kept
+        """
+        self._max_jobs = max_jobs
+        self._jobs = OrderedDict()
+        self._lock = Lock()
+
+    def create(self, name, on_off):
+        """Create pending job for power command.
+
+        :param name: ``String`` device name
+        :param on_off: ``Boolean`` requested power state
+        :returns: ``Dict`` job
+        """
+        job = {
+            'id': uuid.uuid4().hex,
+            'device': name,
+            'power': on_off,
+            'status': PENDING,
+            'created': int(time.time()),
+            'finished': None
+        }
+
+        with self._lock:
+            self._jobs[job['id']] = job
+            while len(self._jobs) > self._max_jobs:
+                self._jobs.popitem(last=False)
+
+        return dict(job)
+
+    def finish(self, id, successful):
+        """Mark job as finished.
+
+        :param id: ``String`` job id
+        :param successful: ``Boolean`` if command was successful, otherwise
+                           optimistic state was rolled back
+        """
+        with self._lock:
+            job = self._jobs.get(id)
+            if job is not None:
+                job['status'] = COMPLETED if successful else ROLLED_BACK
+                job['finished'] = int(time.time())
+
+    def get(self, id):
+        """Get job by id.
+
+        :param id: ``String`` job id
+        :returns: ``Dict`` job or ``None``
+        """
+        with self._lock:
+            job = self._jobs.get(id)
+            return dict(job) if job is not None else None
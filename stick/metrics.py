@@ -0,0 +1,226 @@
+"""Metrics in Prometheus text format, cheap enough to always be on."""
+
+from bisect import bisect_left
+from functools import wraps
+from threading import Lock
+import time
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # seconds
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (name, _escape(value)) for name, value in labels)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Counter, monotonically increasing value per label values."""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        """Create Counter.
+
+        :param name: ``String`` metric name
+        :param help: ``String`` description
+        :param labels: ``[String]`` label names
+        """
+        self.name = name
+        self.help = help
+        self._labels = tuple(labels)
+        self._values = {}
+        self._lock = Lock()
+
+    def inc(self, *label_values, amount=1):
+        """Increment counter.
+
+        :param label_values: values in same order as label names
+        :param amount: ``Number`` to add
+        """
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        """Get samples, see ``MetricsRegistry.render``.
+
+        :returns: ``[(String, [(String, String)], Number)]`` name, labels and value
+        """
+        with self._lock:
+            values = list(self._values.items())
+
+        return [(self.name, list(zip(self._labels, label_values)), value) for label_values, value in values]
+
+
+class Histogram:
+    """Histogram, distribution of observed values per label values.
+
+    Only the bucket an observation falls in is incremented, buckets are
+    made cumulative when rendered.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        """Create Histogram.
+
+        :param name: ``String`` metric name
+        :param help: ``String`` description
+        :param labels: ``[String]`` label names
+        :param buckets: ``[Float]`` sorted upper bounds, ``+Inf`` is added
+        """
+        self.name = name
+        self.help = help
+        self._labels = tuple(labels)
+        self._bounds = tuple(buckets)
+        self._values = {}  # label values to [count per bucket..., count above all, sum]
+        self._lock = Lock()
+
+    def observe(self, value, *label_values):
+        """Observe value.
+
+        :param value: ``Float`` observed value, e.g. seconds
+        :param label_values: values in same order as label names
+        """
+        index = bisect_left(self._bounds, value)
+
+        with self._lock:
+            counts = self._values.get(label_values)
+            if counts is None:
+                counts = self._values[label_values] = [0] * (len(self._bounds) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    def samples(self):
+        """Get samples, see ``MetricsRegistry.render``.
+
+        :returns: ``[(String, [(String, String)], Number)]`` name, labels and value
+        """
+        with self._lock:
+            values = [(label_values, list(counts)) for label_values, counts in self._values.items()]
+
+        samples = []
+        for label_values, counts in values:
+            labels = list(zip(self._labels, label_values))
+            cumulative = 0
+            for bound, count in zip(self._bounds + (float('inf'),), counts):
+                cumulative += count
+                samples.append((self.name + '_bucket', labels + [('le', _format_value(bound))], cumulative))
+            samples.append((self.name + '_count', labels, cumulative))
+            samples.append((self.name + '_sum', labels, counts[-1]))
+
+        return samples
+
+
+class Collected:
+    """Metric read from a callback when rendered, e.g. from existing stats."""
+
+    def __init__(self, name, kind, help, collect):
+        """Create Collected metric.
+
+        :param name: ``String`` metric name
+        :param kind: ``String`` prometheus type, ``counter`` or ``gauge``
+        :param help: ``String`` description
+        :param collect: ``Callable`` returning ``[(Dict, Number)]`` labels and value
+        """
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self._collect = collect
+
+    def samples(self):
+        """Get samples, see ``MetricsRegistry.render``."""
+        return [(self.name, sorted(labels.items()), value) for labels, value in self._collect()]
+
+
+class MetricsRegistry:
+    """MetricsRegistry, all metrics rendered on one page."""
+
+    def __init__(self):
+        """Create empty MetricsRegistry."""
+        self._metrics = {}
+        self._lock = Lock()
+
+    def register(self, metric):
+        """Register metric, replaces metric with same name.
+
+        :param metric: ``Counter``, ``Histogram`` or ``Collected``
+        :returns: the metric
+        """
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labels=()):
+        """Create and register ``Counter``."""
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        """Create and register ``Histogram``."""
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def collected(self, name, kind, help, collect):
+        """Create and register ``Collected`` metric."""
+        return self.register(Collected(name, kind, help, collect))
+
+    def render(self):
+        """Render all metrics in Prometheus text exposition format.
+
+        :returns: ``String``
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+
+        lines = []
+        for metric in metrics:
+            lines.append('# HELP %s %s' % (metric.name, metric.help))
+            lines.append('# TYPE %s %s' % (metric.name, metric.kind))
+            for name, labels, value in metric.samples():
+                lines.append('%s%s %s' % (name, _format_labels(labels), _format_value(value)))
+
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+OPERATION_SECONDS = REGISTRY.histogram('stick_operation_seconds',
+                                       'Duration of tellstick client operations.', ['operation'])
+OPERATIONS = REGISTRY.counter('stick_operations_total',
+                              'Tellstick client operations by outcome.', ['operation', 'outcome'])
+
+
+def instrumented(operation, failed=(False,)):
+    """Decorate method to time it and count outcomes as ``operation``.
+
+    Outcome is ``failure`` if method raises, or returns one of ``failed``.
+
+    :param operation: ``String`` operation name
+    :param failed: ``Tuple`` of return values meaning failure, compared by identity
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            outcome = 'failure'
+            try:
+                result = function(*args, **kwargs)
+                if not any(result is value for value in failed):
+                    outcome = 'success'
+                return result
+            finally:
+                OPERATION_SECONDS.observe(time.perf_counter() - started, operation)
+                OPERATIONS.inc(operation, outcome)
+
+        return wrapper
+
+    return decorator
@@ -1,26 +1,44 @@
 """OnOffDevice, wrapper for a device that can turn on and off only."""
 
+from threading import Lock
 import logging as loggr
+import sys
 import time
 
+from stick.commandqueue import INTERACTIVE
+
 log = loggr.getLogger('smrt')
 
+PROTOCOL = 'Nexa.v1'
+LOCK_STRIPES = 64
+
+_locks = tuple(Lock() for _ in range(LOCK_STRIPES))
+
 
 class OnOffDevice:
-    """OnOffDevice, nothing more to it."""
+    """OnOffDevice, nothing more to it.
+
+    Kept compact for installations with many devices: no instance dict,
+    names are interned, and devices share a small pool of locks. State is
+    changed under the lock of the device, reads are lock free.
+    """
+
+    __slots__ = ['_name', '_id', '_power', '_client', '_last_seen', '_lock', '_listener']
 
     def __init__(self, name, raw_device, client):
         """Create and inialize OnOffDevice.
 
         :param name: name of light, should be unique
         :param raw_device: json object returned from tellstick
-        :param client: tellstick client
+        :param client: ``CommandQueue`` sending commands to tellstick
         """
-        self._name = name
+        self._name = sys.intern(name)
         self._id = raw_device['id']
         self._power = None  # unknown
         self._client = client
         self._last_seen = int(time.time())  # assumed seen when created
+        self._lock = _locks[hash(self._id) % LOCK_STRIPES]
+        self._listener = None
 
     @staticmethod
     def protocol():
@@ -28,7 +46,7 @@ class OnOffDevice:
 
         :returns: ``String`` protocol name
         """
-        return 'Nexa.v1'
+        return PROTOCOL
 
     def get_name(self):
         """Get name of on-off device.
@@ -37,6 +55,20 @@ class OnOffDevice:
         """
         return self._name
 
+    def set_listener(self, listener):
+        """Set listener called when device state changes.
+
+        :param listener: ``Callable(device, changes)``, changes is ``Dict`` of changed fields
+        """
+        self._listener = listener
+
+    def get_id(self):
+        """Get tellstick id of on-off device.
+
+        :returns: ``Integer`` id
+        """
+        return self._id
+
     def __repr__(self):
         """Return string representation of device.
 
@@ -53,30 +85,124 @@ class OnOffDevice:
         """
         return {
             'name': self._name,
-            'protocol': self.protocol(),
+            'protocol': PROTOCOL,
             'power': self._power,
             'last_seen': self._last_seen
         }
 
-    def toggle_power(self):
+    def toggle_power(self, priority=INTERACTIVE):
         """Toggle power for a device.
 
         If state is unknown, this will turn on device.
+        :param priority: ``INTERACTIVE`` or ``AUTOMATION`` command priority.
         :returns: ``Boolean`` if action was successful or not.
         """
-        return self.set_power(True if self._power is None else not self._power)  # turn on if unknown power state
+        return self.set_power(self.toggled_power(), priority)
 
-    def set_power(self, on_off):
+    def toggled_power(self):
+        """Get power state a toggle would set, on if state is unknown.
+
+        :returns: ``Boolean`` power state
+        """
+        return True if self._power is None else not self._power
+
+    def set_power(self, on_off, priority=INTERACTIVE):
         """Set power state for device.
 
+        Command is queued, and may be replaced by a later command for same
+        device before it is sent. Device state is updated with the command
+        actually sent.
+
         :param on_off: ``Boolean`` if device should be on of off.
+        :param priority: ``INTERACTIVE`` or ``AUTOMATION`` command priority.
         :returns: ``Boolean`` if action was successful or not.
         """
-        successful = self._client.power(self._id, on_off)
+        return self.submit_power(on_off, priority).result()
+
+    def submit_power(self, on_off, priority=INTERACTIVE):
+        """Queue power command for device, without waiting for it to be sent.
+
+        Device state is updated when command has been sent, see ``set_power``.
+
+        :param on_off: ``Boolean`` if device should be on of off.
+        :param priority: ``INTERACTIVE`` or ``AUTOMATION`` command priority.
+        :returns: ``Future`` resolving to ``Boolean`` if action was successful or not.
+        """
+        return self._client.submit(self._id, on_off, priority, self.update_power)
+
+    def set_power_async(self, on_off, priority=INTERACTIVE):
+        """Set power state for device without waiting for tellstick.
+
+        Device state is updated optimistically right away, and rolled back
+        to previous state if command fails.
+
+        :param on_off: ``Boolean`` if device should be on of off.
+        :param priority: ``INTERACTIVE`` or ``AUTOMATION`` command priority.
+        :returns: ``Future`` resolving to ``Boolean`` if action was successful or not.
+        """
+        with self._lock:
+            previous = self._power
+            changes = self._set_state(on_off, self._last_seen)
+
+        self._notify(changes)
+
+        def on_done(sent, successful):
+            if successful:
+                self.update_power(sent, successful)
+                return
 
-        if successful:
-            self._last_seen = int(time.time())
+            changes = {}
+            with self._lock:
+                if self._power == on_off:  # roll back optimistic update, unless changed since
+                    changes = self._set_state(previous, self._last_seen)
+
+            self._notify(changes)
+
+        return self._client.submit(self._id, on_off, priority, on_done)
+
+    def observe_power(self, on_off):
+        """Update power state observed on tellstick, e.g. changed by a remote.
+
+        :param on_off: ``Boolean`` observed power state.
+        :returns: ``Boolean`` if state changed.
+        """
+        if on_off == self._power:
+            return False  # unchanged, the common case when reconciling
 
-        self._power = on_off if successful else None  # clear status if update failed
+        with self._lock:
+            changes = self._set_state(on_off, self._last_seen)
+
+        self._notify(changes)
+
+        return bool(changes)
+
+    def update_power(self, on_off, successful):
+        """Update power state after a power command has been sent.
+
+        :param on_off: ``Boolean`` requested power state.
+        :param successful: ``Boolean`` if command was successful.
+        :returns: ``Boolean`` if action was successful or not.
+        """
+        with self._lock:
+            last_seen = int(time.time()) if successful else self._last_seen
+            changes = self._set_state(on_off if successful else None, last_seen)  # clear status if update failed
+
+        self._notify(changes)
 
         return successful
+
+    def _set_state(self, power, last_seen):
+        """Set state, must hold lock.
+
+        :returns: ``Dict`` changed fields
+        """
+        changes = {}
+        if power != self._power:
+            self._power = changes['power'] = power
+        if last_seen != self._last_seen:
+            self._last_seen = changes['last_seen'] = last_seen
+        return changes
+
+    def _notify(self, changes):
+        if changes and self._listener is not None:
+            self._listener(self, changes)
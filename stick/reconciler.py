@@ -0,0 +1,62 @@
+"""Background reconciliation of device state against the Tellstick."""
+
+from threading import Event, Thread
+import logging as loggr
+
+log = loggr.getLogger('smrt')
+
+MIN_INTERVAL = 5  # seconds
+MAX_INTERVAL = 60  # seconds
+
+
+class Reconciler:
+    """Reconciler, periodically syncs device state changed outside stick.
+
+    Interval adapts to how often things change: it is halved after a pass
+    that found changes, and grows by half after a pass without, within
+    ``min_interval`` and ``max_interval``.
+    """
+
+    def __init__(self, reconcile, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL):
+        """Create Reconciler, call ``start`` to start background thread.
+
+        :param reconcile: ``Callable`` performing one pass, returns ``Integer`` number of changes
+        :param min_interval: ``Float`` min seconds between passes
+        :param max_interval: ``Float`` max seconds between passes
+        """
+        self._reconcile = reconcile
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._interval = max_interval
+        self._stopped = Event()
+        self._thread = None
+
+    @property
+    def interval(self):
+        """Get current interval between passes, in seconds."""
+        return self._interval
+
+    def start(self):
+        """Start background thread, if not already started."""
+        if self._thread is None:
+            self._thread = Thread(target=self._run, name='tellstick-reconciler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop background thread."""
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.wait(self._interval):
+            try:
+                changes = self._reconcile()
+            except Exception as err:
+                log.warning('device state reconciliation failed: %s', err)
+                continue
+
+            if changes:
+                self._interval = max(self._min_interval, self._interval / 2)
+            else:
+                self._interval = min(self._max_interval, self._interval * 1.5)
+
+            log.debug('reconciled device state, changes=%s, next pass in %.1f seconds', changes, self._interval)
@@ -0,0 +1,156 @@
+"""Device registry, devices indexed by name and tellstick id."""
+
+from threading import Lock
+
+LISTED_POWER = {1: True, 2: False}  # tellstick state TURNON and TURNOFF
+LISTED_STATE = {True: 1, False: 2}
+
+
+class _Snapshot:
+    """Immutable view of all registered devices."""
+
+    __slots__ = ['by_name', 'by_id', 'devices']
+
+    def __init__(self, by_name, by_id):
+        self.by_name = by_name
+        self.by_id = by_id
+        self.devices = tuple(by_name.values())
+
+
+class DeviceRegistry:
+    """DeviceRegistry, thread safe and read-mostly.
+
+    Readers use the current snapshot and never take a lock, so they never
+    block each other or wait for writers. Writers build a new snapshot and
+    swap it in with a single assignment.
+
+    Version is incremented whenever a device is added or changes state, so
+    anything derived from the devices can be cached per version. The same
+    changes are appended as events to the event log, if any.
+    """
+
+    def __init__(self, events=None):
+        """Create empty DeviceRegistry.
+
+        :param events: ``EventLog`` receiving device events
+        """
+        self._snapshot = _Snapshot({}, {})
+        self._events = events
+        self._write_lock = Lock()
+        self._version = 0
+        self._version_lock = Lock()
+
+    @property
+    def version(self):
+        """Get version, incremented on every change.
+
+        :returns: ``Integer``
+        """
+        return self._version
+
+    def get(self, name):
+        """Get device by name.
+
+        :param name: ``String`` device name
+        :returns: ``OnOffDevice`` or ``None``
+        """
+        return self._snapshot.by_name.get(name)
+
+    def get_by_id(self, id):
+        """Get device by tellstick id.
+
+        :param id: tellstick device id
+        :returns: ``OnOffDevice`` or ``None``
+        """
+        return self._snapshot.by_id.get(id)
+
+    def devices(self):
+        """Get all devices.
+
+        :returns: ``[OnOffDevice]``
+        """
+        return list(self._snapshot.devices)
+
+    def __contains__(self, name):
+        """Check if device with name is registered."""
+        return name in self._snapshot.by_name
+
+    def __len__(self):
+        """Get number of registered devices."""
+        return len(self._snapshot.devices)
+
+    def update(self, raw_devices, create):
+        """Swap in freshly listed devices.
+
+        Devices already registered are kept as is, with their state. Devices
+        not in the listing are kept too, once discovered a device stays. New
+        devices start with listed state, if any.
+
+        :param raw_devices: ``[Dict]`` devices as listed by tellstick
+        :param create: ``Callable(raw_device)`` returning new ``OnOffDevice``
+        :returns: ``[OnOffDevice]`` devices that were added
+        """
+        with self._write_lock:
+            snapshot = self._snapshot
+            new_raw_devices = [raw_device for raw_device in raw_devices
+                               if raw_device['name'] not in snapshot.by_name]
+            added = [create(raw_device) for raw_device in new_raw_devices]
+
+            if not added:
+                return added
+
+            by_name = dict(snapshot.by_name)
+            by_id = dict(snapshot.by_id)
+            listener = self._changed  # one bound method shared by all devices
+            for device, raw_device in zip(added, new_raw_devices):
+                power = LISTED_POWER.get(raw_device.get('state'))
+                if power is not None:
+                    device.observe_power(power)  # initial state, before listener is set
+                by_name[device.get_name()] = device
+                by_id[device.get_id()] = device
+                device.set_listener(listener)
+
+            self._snapshot = _Snapshot(by_name, by_id)
+            self._bump()
+
+        if self._events is not None:
+            for device in added:
+                state = device.json()
+                self._events.append({'type': 'added', 'device': state['name'],
+                                     'power': state['power'], 'last_seen': state['last_seen']})
+
+        return added
+
+    def reconcile(self, raw_devices, skip):
+        """Update power of registered devices from listed state.
+
+        :param raw_devices: ``[Dict]`` devices as listed by tellstick, with ``state``
+        :param skip: ``Callable(id)`` true for devices not to update, e.g. with pending commands
+        :returns: ``Integer`` number of devices that changed
+        """
+        by_name = self._snapshot.by_name
+        changed = 0
+
+        for raw_device in raw_devices:
+            device = by_name.get(raw_device['name'])
+            power = LISTED_POWER.get(raw_device.get('state'))
+            if device is None or power is None or skip(device.get_id()):
+                continue
+
+            if device.observe_power(power):
+                changed += 1
+
+        return changed
+
+    def _changed(self, device, changes):
+        """Record device change, bump version and append event."""
+        self._bump()
+
+        if self._events is not None:
+            event = {'type': 'changed', 'device': device.get_name()}
+            event.update(changes)
+            self._events.append(event)
+
+    def _bump(self):
+        with self._version_lock:
+            self._version += 1
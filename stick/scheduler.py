@@ -0,0 +1,186 @@
+"""Timed and recurring power actions, run on a single timer thread."""
+
+from heapq import heapify, heappop, heappush
+from threading import Condition, Thread
+import logging as loggr
+import math
+import time
+import uuid
+
+log = loggr.getLogger('smrt')
+
+MAX_SCHEDULES = 100000
+MIN_INTERVAL = 1  # seconds, shortest allowed interval of recurring schedules
+MAX_WAIT = 60  # seconds, wake up at least this often in case wall clock jumps
+
+
+class _Schedule:
+    """Scheduled action, small as there may be many."""
+
+    __slots__ = ['id', 'action', 'due', 'every']
+
+    def __init__(self, id, action, due, every):
+        self.id = id
+        self.action = action
+        self.due = due
+        self.every = every
+
+    def json(self):
+        schedule = {'id': self.id, 'next': self.due, 'every': self.every}
+        schedule.update(self.action)
+        return schedule
+
+
+class Scheduler:
+    """Scheduler, runs actions at given times, once or repeatedly.
+
+    Schedules are kept in a heap ordered by due time, and one thread sleeps
+    until the earliest is due. All actions due at the same time are handed
+    to ``dispatch`` as one batch. Deleted schedules are left in the heap
+    and skipped when popped, the heap is compacted when most of it is
+    deleted. Idle schedules cost a heap entry and a small object each.
+    """
+
+    def __init__(self, dispatch, max_schedules=MAX_SCHEDULES, min_interval=MIN_INTERVAL):
+        """Create Scheduler, thread is started on first ``add``.
+
+        :param dispatch: ``Callable([Dict])`` running a batch of due actions
+        :param max_schedules: ``Integer`` max number of schedules
+        :param min_interval: ``Float`` shortest allowed seconds between runs of recurring schedules
+        """
+        self._dispatch = dispatch
+        self._max_schedules = max_schedules
+        self._min_interval = min_interval
+
+        self._schedules = {}  # id to ``_Schedule``
+        self._heap = []  # (due, id), may hold deleted or rescheduled entries
+        self._condition = Condition()
+        self._stopped = False
+        self._thread = None
+
+    def add(self, action, at=None, every=None):
+        """Schedule action.
+
+        :param action: ``Dict`` json serializable action, passed to dispatch
+        :param at: ``Float`` unix time of first run, defaults to now plus ``every``
+        :param every: ``Float`` seconds between runs, ``None`` runs once
+        :returns: ``Dict`` schedule, or ``None`` if there are too many schedules
+        :raises ValueError: if ``at`` or ``every`` is not finite, or ``every`` is below min interval
+        """
+        if at is not None and not math.isfinite(at):
+            raise ValueError('"at" must be a finite number')
+        if every is not None and not (math.isfinite(every) and every >= self._min_interval):
+            raise ValueError('"every" must be a finite number of at least %s seconds' % self._min_interval)
+
+        due = at if at is not None else time.time() + (every or 0)
+        schedule = _Schedule(uuid.uuid4().hex, action, due, every)
+
+        with self._condition:
+            if len(self._schedules) >= self._max_schedules:
+                return None
+
+            self._schedules[schedule.id] = schedule
+            heappush(self._heap, (due, schedule.id))
+
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name='stick-scheduler', daemon=True)
+                self._thread.start()
+            elif self._heap[0][1] == schedule.id:
+                self._condition.notify()  # new earliest, sleep less
+
+            return schedule.json()
+
+    def delete(self, id):
+        """Delete schedule.
+
+        :param id: ``String`` schedule id
+        :returns: ``Boolean`` if schedule existed
+        """
+        with self._condition:
+            if self._schedules.pop(id, None) is None:
+                return False
+
+            if len(self._heap) > 2 * len(self._schedules) + 64:
+                self._compact()
+
+            return True
+
+    def get(self, id):
+        """Get schedule.
+
+        :param id: ``String`` schedule id
+        :returns: ``Dict`` schedule or ``None``
+        """
+        with self._condition:
+            schedule = self._schedules.get(id)
+            return schedule.json() if schedule is not None else None
+
+    def schedules(self):
+        """Get all schedules, earliest first.
+
+        :returns: ``[Dict]``
+        """
+        with self._condition:
+            schedules = list(self._schedules.values())
+
+        return [schedule.json() for schedule in sorted(schedules, key=lambda schedule: schedule.due)]
+
+    def __len__(self):
+        """Get number of schedules."""
+        return len(self._schedules)
+
+    def stop(self):
+        """Stop scheduler thread."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+
+    def _compact(self):
+        """Drop heap entries of deleted schedules, must hold lock."""
+        self._heap = [(schedule.due, schedule.id) for schedule in self._schedules.values()]
+        heapify(self._heap)
+
+    def _due(self, now):
+        """Pop schedules due at now, and reschedule recurring ones, must hold lock."""
+        batch = []
+
+        while self._heap and self._heap[0][0] <= now:
+            due, id = heappop(self._heap)
+            schedule = self._schedules.get(id)
+            if schedule is None or schedule.due != due:
+                continue  # deleted
+
+            batch.append(schedule.action)
+
+            if schedule.every:
+                missed = (now - due) // schedule.every  # runs missed while stopped are skipped
+                schedule.due = due + (missed + 1) * schedule.every
+                heappush(self._heap, (schedule.due, id))
+            else:
+                del self._schedules[id]
+
+        return batch
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    now = time.time()
+                    if self._heap and self._heap[0][0] <= now:
+                        break
+                    timeout = min(self._heap[0][0] - now, MAX_WAIT) if self._heap else None
+                    self._condition.wait(timeout)
+
+                if self._stopped:
+                    return
+
+                batch = self._due(time.time())
+
+            if not batch:
+                continue
+
+            log.debug('dispatching %i scheduled actions', len(batch))
+            try:
+                self._dispatch(batch)
+            except Exception as err:
+                log.warning('failed to dispatch scheduled actions: %s', err)
@@ -0,0 +1,229 @@
+"""Shared state, lets worker processes on one host share one tellstick session."""
+
+from threading import Lock, get_ident
+import json
+import logging as loggr
+import os
+import sqlite3
+import time
+
+log = loggr.getLogger('smrt')
+
+LEASE_TTL = 60  # seconds a lease is held unless released or renewed
+MAX_SLOT_AHEAD = 60  # seconds, a reserved slot further ahead is from a wall clock that was set back
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS devices (id TEXT PRIMARY KEY, raw TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS slots (name TEXT PRIMARY KEY, next REAL NOT NULL);
+'''
+
+
+class SharedState:
+    """SharedState, sqlite database shared by all worker processes on a host.
+
+    Holds what would otherwise be kept per process: address and token, the
+    latest device listing including device state, leases electing one
+    process at a time to authorize, refresh token or list devices, and send
+    slots keeping all processes within one command rate. Has the same
+    ``load`` and ``save`` as ``StateFile``.
+
+    Every process opens its own connection, also when forked after the
+    database was first used. If the database cannot be used, each process
+    falls back to doing everything itself.
+    """
+
+    def __init__(self, path, timeout=10):
+        """Create SharedState, database is created on first use.
+
+        :param path: ``String`` path to sqlite database
+        :param timeout: ``Float`` seconds to wait for a lock held by another process
+        """
+        self._path = path
+        self._timeout = timeout
+        self._lock = Lock()
+        self._connection = None
+        self._pid = None
+
+    def _connect(self):
+        """Get connection of this process, must hold lock."""
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(self._path, timeout=self._timeout, isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')  # readers do not block the writer
+            connection.executescript(SCHEMA)
+            os.chmod(self._path, 0o600)  # holds bearer token
+
+            self._connection = connection
+            self._pid = os.getpid()
+
+        return self._connection
+
+    @staticmethod
+    def _owner():
+        """Get lease owner, a thread of a process."""
+        return '%i:%i' % (os.getpid(), get_ident())
+
+    def load(self):
+        """Load address and token, see ``StateFile.load``.
+
+        :returns: ``Dict`` state, empty if missing or unreadable
+        """
+        try:
+            with self._lock:
+                row = self._connect().execute('SELECT value FROM state WHERE key = ?', ('tellstick',)).fetchone()
+        except sqlite3.Error as err:
+            log.warning('could not read shared state "%s": %s', self._path, err)
+            return {}
+
+        return json.loads(row[0]) if row is not None else {}
+
+    def save(self, state):
+        """Save address and token, see ``StateFile.save``.
+
+        :param state: ``Dict`` json serializable state
+        """
+        try:
+            with self._lock:
+                self._connect().execute('INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)',
+                                        ('tellstick', json.dumps(state)))
+        except sqlite3.Error as err:
+            log.warning('could not write shared state "%s": %s', self._path, err)
+
+    def devices(self):
+        """Get latest device listing saved by any process.
+
+        :returns: ``(Float, [Dict])`` unix time of listing and devices as
+                  listed by tellstick, ``(None, None)`` if never listed
+        """
+        try:
+            with self._lock:
+                connection = self._connect()
+                connection.execute('BEGIN')
+                try:
+                    row = connection.execute('SELECT value FROM state WHERE key = ?', ('listed_at',)).fetchone()
+                    raw_devices = [json.loads(raw) for (raw,) in connection.execute('SELECT raw FROM devices')]
+                finally:
+                    connection.execute('COMMIT')
+        except sqlite3.Error as err:
+            log.warning('could not read shared devices "%s": %s', self._path, err)
+            return None, None
+
+        if row is None:
+            return None, None
+
+        return json.loads(row[0]), raw_devices
+
+    def save_devices(self, raw_devices, listed_at=None):
+        """Replace device listing.
+
+        :param raw_devices: ``[Dict]`` devices as listed by tellstick
+        :param listed_at: ``Float`` unix time listing was requested, defaults to now
+        """
+        try:
+            with self._lock:
+                connection = self._connect()
+                connection.execute('BEGIN IMMEDIATE')
+                try:
+                    connection.execute('DELETE FROM devices')
+                    connection.executemany('INSERT INTO devices (id, raw) VALUES (?, ?)',
+                                           [(str(raw_device['id']), json.dumps(raw_device))
+                                            for raw_device in raw_devices])
+                    connection.execute('INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)',
+                                       ('listed_at', json.dumps(listed_at or time.time())))
+                    connection.execute('COMMIT')
+                except sqlite3.Error:
+                    connection.execute('ROLLBACK')
+                    raise
+        except sqlite3.Error as err:
+            log.warning('could not write shared devices "%s": %s', self._path, err)
+
+    def set_device_state(self, id, state):
+        """Set tellstick state of a listed device, e.g. after a power command.
+
+        :param id: tellstick device id
+        :param state: ``Integer`` tellstick state, as in a listing
+        """
+        try:
+            with self._lock:
+                connection = self._connect()
+                connection.execute('BEGIN IMMEDIATE')
+                try:
+                    row = connection.execute('SELECT raw FROM devices WHERE id = ?', (str(id),)).fetchone()
+                    if row is not None:
+                        raw_device = json.loads(row[0])
+                        raw_device['state'] = state
+                        connection.execute('UPDATE devices SET raw = ? WHERE id = ?',
+                                           (json.dumps(raw_device), str(id)))
+                    connection.execute('COMMIT')
+                except sqlite3.Error:
+                    connection.execute('ROLLBACK')
+                    raise
+        except sqlite3.Error as err:
+            log.warning('could not write shared device state "%s": %s', self._path, err)
+
+    def acquire(self, name, ttl=LEASE_TTL):
+        """Acquire or renew lease, held by calling thread until released or expired.
+
+        Other threads of the same process are excluded as other processes are.
+
+        :param name: ``String`` lease name
+        :param ttl: ``Float`` seconds until lease expires
+        :returns: ``Boolean`` if calling thread holds the lease
+        """
+        now = time.time()
+
+        try:
+            with self._lock:
+                cursor = self._connect().execute(
+                    'INSERT INTO leases (name, owner, expires) VALUES (?, ?, ?) '
+                    'ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires = excluded.expires '
+                    'WHERE leases.owner = excluded.owner OR leases.expires < ?',
+                    (name, self._owner(), now + ttl, now))
+        except sqlite3.Error as err:
+            log.warning('could not acquire shared lease "%s": %s', name, err)
+            return True  # cannot coordinate, act alone
+
+        return cursor.rowcount > 0
+
+    def release(self, name):
+        """Release lease, if held by calling thread.
+
+        :param name: ``String`` lease name
+        """
+        try:
+            with self._lock:
+                self._connect().execute('DELETE FROM leases WHERE name = ? AND owner = ?', (name, self._owner()))
+        except sqlite3.Error as err:
+            log.warning('could not release shared lease "%s": %s', name, err)
+
+    def reserve(self, name, interval):
+        """Reserve next slot of a rate shared by all processes, e.g. of commands sent by one tellstick.
+
+        Slots are ``interval`` apart, handed out in order of reservation.
+
+        :param name: ``String`` rate name
+        :param interval: ``Float`` seconds between slots
+        :returns: ``Float`` unix time of reserved slot, now if next slot has passed
+        """
+        now = time.time()
+
+        try:
+            with self._lock:
+                connection = self._connect()
+                connection.execute('BEGIN IMMEDIATE')
+                try:
+                    row = connection.execute('SELECT next FROM slots WHERE name = ?', (name,)).fetchone()
+                    slot = now if row is None else max(now, min(row[0], now + MAX_SLOT_AHEAD))
+                    connection.execute('INSERT OR REPLACE INTO slots (name, next) VALUES (?, ?)',
+                                       (name, slot + interval))
+                    connection.execute('COMMIT')
+                except sqlite3.Error:
+                    connection.execute('ROLLBACK')
+                    raise
+        except sqlite3.Error as err:
+            log.warning('could not reserve shared slot "%s": %s', name, err)
+            return now  # cannot coordinate, act alone
+
+        return slot
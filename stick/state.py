@@ -0,0 +1,53 @@
+"""Local state file, keeps tellstick address and token between restarts."""
+
+import json
+import logging as loggr
+import os
+import tempfile
+
+log = loggr.getLogger('smrt')
+
+
+class StateFile:
+    """StateFile, small json document persisted atomically on disk.
+
+    File holds a bearer token, so it is only readable by owner.
+    """
+
+    def __init__(self, path):
+        """Create StateFile.
+
+        :param path: ``String`` path to state file, created on first save
+        """
+        self._path = path
+
+    def load(self):
+        """Load state from file.
+
+        :returns: ``Dict`` state, empty if file is missing or unreadable
+        """
+        try:
+            with open(self._path, 'r') as state_file:
+                state = json.load(state_file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as err:
+            log.warning('could not read state file "%s": %s', self._path, err)
+            return {}
+
+        return state if isinstance(state, dict) else {}
+
+    def save(self, state):
+        """Save state to file, replaces previous state atomically.
+
+        :param state: ``Dict`` json serializable state
+        """
+        directory = os.path.dirname(os.path.abspath(self._path))
+
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.stick-state-')
+            with os.fdopen(fd, 'w') as tmp_file:
+                json.dump(state, tmp_file)
+            os.replace(tmp_path, self._path)
+        except OSError as err:
+            log.warning('could not write state file "%s": %s', self._path, err)
@@ -1,26 +1,59 @@
 """Tellstick local API client."""
 
-from threading import Timer
+from functools import partial
+from threading import Lock
 import logging as loggr
+import random
 import socket
+import time
 
 import requests
 
+from stick.breaker import CircuitOpenError
+from stick.cache import NegativeCache, RefreshingCache
+from stick.commandqueue import COMMAND_RATE, CommandQueue
+from stick.metrics import instrumented
 from stick.onoffdevice import OnOffDevice
+from stick.reconciler import MAX_INTERVAL, MIN_INTERVAL, Reconciler
+from stick.registry import LISTED_STATE, DeviceRegistry
+from stick.sharedstate import SharedState
+from stick.state import StateFile
+from stick.tokenrefresher import TokenRefresher
+from stick.transport import Transport
 
 log = loggr.getLogger('smrt')
 
-
-def discover_tellstick():
-    """Perform local discovery for Telldus devices."""
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-
-    sock.settimeout(10)  # allow 10 seconds for discovery
-    sock.sendto(b'D', ('255.255.255.255', 30303))
-
-    data, (address, port) = sock.recvfrom(1024)  # handle no answer?
+DEVICE_CACHE_TTL = 5  # seconds
+UNKNOWN_NAME_TTL = 60  # seconds
+UNKNOWN_NAME_MAX = 1024
+DISCOVERY_ADDRESS = ('255.255.255.255', 30303)  # tellsticks answer broadcast on this port
+DISCOVERY_WINDOW = 3  # seconds to collect answers when discovering all tellsticks
+SUPPORTED_METHODS = 3  # TURNON | TURNOFF, makes tellstick include device state in listing
+TOKEN_EXPIRY_MARGIN = 60  # seconds, persisted token must be valid at least this long to be reused
+SHARED_POLL_INTERVAL = 0.5  # seconds between checks for a token from another process
+LIST_LEASE_TTL = 30  # seconds, max time one process may take to list devices for all
+COMMAND_RETRIES = 2  # retries of a failed power command
+RETRY_BACKOFF = 0.1  # seconds, max wait before first retry, doubled for every retry
+REDISCOVERY_INTERVAL = 60  # seconds, min time between discoveries, as each may wait for discovery timeout
+
+
+def discover_tellstick(timeout=10):
+    """Perform local discovery for Telldus devices.
+
+    :param timeout: ``Float`` seconds to wait for an answer
+    :returns: ``String`` address of first tellstick answering, or ``None`` if none answered
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+
+        sock.settimeout(timeout)
+        try:
+            sock.sendto(b'D', DISCOVERY_ADDRESS)
+            data, (address, port) = sock.recvfrom(1024)
+        except OSError as err:
+            log.warning('no tellstick answered discovery: %s', err)
+            return None
 
     split_data = data.split(b':')
     ts_type = split_data[0].decode('utf-8')
@@ -31,12 +64,94 @@ def discover_tellstick():
     return address
 
 
+def discover_tellsticks(window=DISCOVERY_WINDOW):
+    """Perform local discovery for all Telldus devices answering within window.
+
+    :param window: ``Float`` seconds to collect answers
+    :returns: ``[String]`` addresses, in order of answer
+    """
+    addresses = []
+    deadline = time.monotonic() + window
+
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+
+        try:
+            sock.sendto(b'D', DISCOVERY_ADDRESS)
+
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                sock.settimeout(remaining)
+
+                try:
+                    data, (address, port) = sock.recvfrom(1024)
+                except socket.timeout:
+                    break
+
+                split_data = data.split(b':')
+                if len(split_data) < 4 or address in addresses:
+                    continue
+
+                log.debug('discovered Tellstick "%s" (%s) at %s:%s',
+                          split_data[0].decode('utf-8'), split_data[3].decode('utf-8'), address, port)
+                addresses.append(address)
+        except OSError as err:
+            log.warning('tellstick discovery failed: %s', err)
+
+    return addresses
+
+
+def login_telldus_live(auth_url, username, password, timeout):
+    """Login to telldus live and trust stick as application.
+
+    Step 2-4 of authorization, between requesting and fetching token from
+    tellstick.
+
+    :param auth_url: ``String`` authorization url given by tellstick
+    :param username: ``String`` telldus live username
+    :param password: ``String`` telldus live password
+    :param timeout: ``(connect, read)`` timeout tuple
+    """
+    session = requests.Session()  # keep session between calls, telldus live needs cookies
+
+    # step 2: get authorization/login page from telldus live
+    response = session.get(auth_url, timeout=timeout)
+
+    if response.status_code != 200:
+        log.error(f'failed to get authorization page, code={response.status_code}, body={response.text}')
+        raise RuntimeError('Failed to get authorization page')
+
+    login_url = response.url  # redirected here, get the new url
+
+    # step 3: login to telldus live
+    response = session.post(login_url,
+                            data={'email': username, 'password': password},
+                            timeout=timeout)
+
+    if response.status_code != 200:
+        log.error(f'failed to login to telldus live, code={response.status_code}, body={response.text}')
+        raise RuntimeError('Failed to login to telldus live')
+
+    trust_url = response.url
+
+    # step 4: authorize application, typically only done once but stick always does this
+    response = session.post(trust_url,
+                            data={'trust': 'yes'},
+                            timeout=timeout)
+
+    if response.status_code != 200:
+        log.error(f'failed to trust application, code={response.status_code}, body={response.text}')
+        raise RuntimeError('Failed to trust stick as application')
+
+
 class Tellstick:
     """Tellstick Local API implementation."""
 
     _username = None
     _password = None
-    _devices = {}
     _ts_address = None
     _ts_type = None
     _ts_version = None
@@ -44,38 +159,233 @@ class Tellstick:
     _ts_bearer_expiry = None
     _renewal_allowed = False
 
-    def __init__(self, username, password):
+    def __init__(self, username, password, address=None, transport=None, cache=None, state_file=None,
+                 commands=None, events=None, reconcile=None, shared_state=None):
         """Create and initialize Tellstick.
 
+        No calls are made until first use. Address and token are reused from
+        state file if available and still valid, otherwise discovery and
+        authorization is done on first use.
+
         :param username: ``String`` tellstick username
         :param password: ``String`` tellstick password
+        :param address: ``String`` tellstick address, discovered if omitted
+        :param transport: ``Dict`` options for ``Transport``
+        :param cache: ``Dict`` cache options, ``ttl`` of device list, and ``unknown_ttl``
+                      and ``unknown_max`` for names not found
+        :param state_file: ``String`` path where address and token are persisted
+        :param commands: ``Dict`` command queue options, ``rate`` in commands per second,
+                         shared by all worker processes with shared state, ``retries`` of
+                         failed commands and ``retry_backoff`` in seconds
+        :param events: ``EventLog`` receiving device events
+        :param reconcile: ``Dict`` reconciler options, ``min_interval`` and ``max_interval``
+                          in seconds, or ``enabled`` false to disable
+        :param shared_state: ``String`` path to database shared with other worker
+                             processes, replaces state file if given
         """
         self._username = username
         self._password = password
+        self._ts_address = address
+
+        self._registry = DeviceRegistry(events)
+        self._transport = Transport(address, **(transport or {}))
+        cache = cache or {}
+        self._device_cache_ttl = cache.get('ttl', DEVICE_CACHE_TTL)
+        self._device_cache = RefreshingCache(self._list_devices, self._device_cache_ttl)
+        self._unknown_names = NegativeCache(cache.get('unknown_ttl', UNKNOWN_NAME_TTL),
+                                            cache.get('unknown_max', UNKNOWN_NAME_MAX))
+
+        self._shared = SharedState(shared_state) if shared_state is not None else None
+        self._state_file = self._shared or (StateFile(state_file) if state_file is not None else None)
+
+        self._auth_lock = Lock()
+        self._refresher = TokenRefresher(self._refresh_token)
+        commands = commands or {}
+        self._commands = CommandQueue(self.power, commands.get('rate', COMMAND_RATE),
+                                      partial(self._shared.reserve, 'commands') if self._shared else None)
+        self._retries = commands.get('retries', COMMAND_RETRIES)
+        self._retry_backoff = commands.get('retry_backoff', RETRY_BACKOFF)
+
+        reconcile = reconcile or {}
+        self._reconciler = None
+        self._changed_outside = 0  # by latest listing
+        if reconcile.get('enabled', True):
+            self._reconciler = Reconciler(self.reconcile,
+                                          reconcile.get('min_interval', MIN_INTERVAL),
+                                          reconcile.get('max_interval', MAX_INTERVAL))
+        self._address_from_state = False
+        self._discovered_at = None
+        self._load_state()
+
+    def _load_state(self):
+        """Reuse address and token from state file, if any."""
+        if self._state_file is None:
+            return
+
+        state = self._state_file.load()
+
+        if self._ts_address is None and state.get('address') is not None:
+            self._ts_address = state['address']
+            self._address_from_state = True
+            self._transport.set_address(self._ts_address)
 
-        self._try_dicovered_and_authorized()
+        if state.get('address') != self._ts_address:
+            return  # token belongs to another tellstick
 
-        self._refresh_token()
+        expiry = state.get('expiry')
+        if state.get('bearer') is None or expiry is None or expiry - time.time() < TOKEN_EXPIRY_MARGIN:
+            log.debug('persisted token missing or about to expire, will authorize on first use')
+            return
+
+        self._ts_bearer = state['bearer']
+        self._ts_bearer_expiry = expiry
+        self._renewal_allowed = state.get('renewal_allowed', False)
+        self._transport.set_bearer(self._ts_bearer)
+
+        log.debug('reusing persisted token for %s, expires %s', self._ts_address, expiry)
+
+        self._schedule_refresh()
+
+    def _save_state(self):
+        """Persist address and token to state file, if any."""
+        if self._state_file is None:
+            return
+
+        self._state_file.save({
+            'address': self._ts_address,
+            'bearer': self._ts_bearer,
+            'expiry': self._ts_bearer_expiry,
+            'renewal_allowed': self._renewal_allowed
+        })
 
     def _try_dicovered_and_authorized(self):
-        """Try to discover and authorize."""
-        if self._ts_address is None:
-            self._ts_address = discover_tellstick()
+        """Try to discover and authorize, concurrent callers wait for the same attempt."""
+        if self._ts_address is not None and self._ts_bearer is not None:
+            return True
+
+        with self._auth_lock:
+            if self._ts_address is None:
+                self._discover()
+
+            if self._ts_address is not None and self._ts_bearer is None:
+                try:
+                    self._authorize_once()
+                except requests.ConnectionError:
+                    if not self._address_from_state:
+                        raise
+                    log.debug('persisted address %s not reachable, falling back to discovery', self._ts_address)
+                    if not self._discover():
+                        raise
+                    self._authorize_once()
+
+        return self._ts_address is not None and self._ts_bearer is not None
+
+    def rediscover(self):
+        """Discover tellstick again if persisted address is not reachable.
 
-        if self._ts_address is not None and self._ts_bearer is None:
+        Tellstick may have got a new address since address was persisted,
+        e.g. from DHCP. Token is kept, it is still valid at the new address.
+
+        :returns: ``Boolean`` if tellstick was discovered and the call should be retried
+        """
+        if not self._address_from_state:
+            return False
+
+        with self._auth_lock:
+            if not self._address_from_state:
+                return True  # discovered by concurrent caller
+
+            log.info('persisted address %s not reachable, falling back to discovery', self._ts_address)
+            return self._discover()
+
+    def _discover(self):
+        """Discover tellstick, at most once per ``REDISCOVERY_INTERVAL``, must hold auth lock.
+
+        Address is kept if no tellstick answers.
+
+        :returns: ``Boolean`` if tellstick was discovered
+        """
+        now = time.monotonic()
+        if self._discovered_at is not None and now - self._discovered_at < REDISCOVERY_INTERVAL:
+            log.debug('tellstick discovered less than %s seconds ago, not discovering again', REDISCOVERY_INTERVAL)
+            return False
+        self._discovered_at = now
+
+        address = discover_tellstick()
+        if address is None:
+            return False
+
+        self._ts_address = address
+        self._address_from_state = False
+        self._transport.set_address(self._ts_address)
+        self._save_state()
+        return True
+
+    def _authorize_once(self):
+        """Authorize, unless another worker process sharing state already does.
+
+        Only the process holding the authorize lease logs in, the others wait
+        for its token to show up in shared state.
+        """
+        if self._shared is None:
             self._authorize()
+            return
 
-        return self._ts_address is not None and self._ts_bearer is not None
+        while not self._shared.acquire('authorize'):
+            time.sleep(SHARED_POLL_INTERVAL)
+            self._load_state()
+            if self._ts_bearer is not None:
+                log.debug('using token from another process')
+                return
 
+        try:
+            self._load_state()  # may have been authorized just before lease was released
+            if self._ts_bearer is None:
+                self._authorize()
+        finally:
+            self._shared.release('authorize')
+
+    def call_failed(self, status_code, attempt):
+        """Handle call not accepted by tellstick.
+
+        If token was not accepted it is refreshed, on first attempt only, or
+        authorization is done again if token cannot be refreshed. Only server
+        errors and rejected tokens are worth retrying, other client errors
+        such as an unknown device fail the same way again.
+
+        :param status_code: ``Integer`` http status code of response
+        :param attempt: ``Integer`` attempt of call, first is 0
+        :returns: ``Boolean`` if call may be retried
+        """
+        if status_code in (401, 403) and attempt == 0:
+            log.debug('token not accepted (%s), will force token refresh', status_code)
+            if not self._refresher.refresh_now() and status_code == 401:
+                self._token_rejected()
+
+        return status_code == 401 or status_code >= 500
+
+    def _token_rejected(self):
+        """Forget token rejected by tellstick, next call will authorize again."""
+        if self._shared is not None:
+            rejected = self._ts_bearer
+            self._load_state()
+            if self._ts_bearer != rejected:
+                log.debug('token rejected, using newer token from another process')
+                return
+
+        log.debug('token rejected by tellstick, will authorize on next call')
+        self._ts_bearer = None
+        self._ts_bearer_expiry = None
+        self._transport.set_bearer(None)
+        self._save_state()
+
+    @instrumented('authorize', failed=())
     def _authorize(self):
         """Authorize stick against telldus live api to get token."""
-        session = requests.Session()  # keep session between calls
-
         log.debug('starting tellstick login procedure')
 
         # step 1: create token request
-        response = session.put('http://%s/api/token' % self._ts_address,
-                               data={'app': 'smrtstick'})
+        response = self._transport.put('/api/token', data={'app': 'smrtstick'})
 
         if response.status_code != 200:
             raise RuntimeError('Failed to get token page, got code=%s', response.status_code)
@@ -88,45 +398,20 @@ class Tellstick:
         auth_url = json_token['authUrl']
         token = json_token['token']
 
-        # step 2: get authorization/login page from telldus live
-        response = session.get(auth_url)
-
-        if response.status_code != 200:
-            log.error(f'failed to get authorization page, code={response.status_code}, body={response.text}')
-            raise RuntimeError('Failed to get authorization page')
-
-        login_url = response.url  # redirected here, get the new url
-
-        # step 3: login to telldus live
-        response = session.post(login_url,
-                                data={'email': self._username, 'password': self._password})
-
-        if response.status_code != 200:
-            log.error(f'failed to login to telldus live, code={response.status_code}, body={response.text}')
-            raise RuntimeError('Failed to login to telldus live')
-
-        trust_url = response.url
-
-        # step 4: authorize application, typically only done once but stick always does this
-        response = session.post(trust_url,
-                                data={'trust': 'yes'})
-
-        if response.status_code != 200:
-            log.error(f'failed to trust application, code={response.status_code}, body={response.text}')
-            raise RuntimeError('Failed to trust stick as application')
+        # step 2-4: login to telldus live and trust application
+        login_telldus_live(auth_url, self._username, self._password, self._transport.timeout)
 
         # step 5: autorize application
-        response = session.post('http://%s/api/authorize' % self._ts_address,
-                                params={'token': token},
-                                data={'ttl': 525600, 'extend': 1})
+        response = self._transport.post('/api/authorize',
+                                        params={'token': token},
+                                        data={'ttl': 525600, 'extend': 1})
 
         if response.status_code != 200:
             log.error(f'failed to authorize, code={response.status_code}, body={response.text}')
             raise RuntimeError('Failed to authorize application')
 
         # step 6: final step, get the bearer token
-        response = session.get('http://%s/api/token' % self._ts_address,
-                               params={'token': token})
+        response = self._transport.get('/api/token', params={'token': token})
 
         if response.status_code != 200:
             log.error(f'failed to get token, code={response.status_code}, body={response.text}')
@@ -140,97 +425,391 @@ class Tellstick:
 
         self._ts_bearer = json_token['token']
         self._ts_bearer_expiry = json_token['expires']
+        self._transport.set_bearer(self._ts_bearer)
 
         log.debug('stick successfully authenticated and authorized: %s', self._ts_bearer is not None)
 
         self._renewal_allowed = response.json()['allowRenew']
         log.debug('renewal allowed of token=%s', self._renewal_allowed)
 
-    def _refresh_token(self):
+        self._save_state()
+        self._schedule_refresh()
+
+    def _schedule_refresh(self):
         if not self._renewal_allowed:
             log.debug('no renewal will be performed, not permitted')
             return
 
-        response = requests.get('http://%s/api/refreshToken' % self._ts_address,
-                                headers={'Authorization': 'Bearer %s' % self._ts_bearer})
+        self._refresher.schedule(self._ts_bearer_expiry)
+
+    @instrumented('refresh_token')
+    def _refresh_token(self):
+        """Refresh bearer token, called by token refresher only.
+
+        :returns: ``Boolean`` if token was refreshed
+        """
+        if not self._renewal_allowed or self._ts_bearer is None:
+            log.debug('no renewal will be performed, not permitted or not authorized')
+            return False
+
+        if self._shared is None:
+            return self._request_refresh()
+
+        bearer = self._ts_bearer
+        self._load_state()
+        if self._ts_bearer != bearer:
+            log.debug('token already refreshed by another process')
+            return True
+
+        if not self._shared.acquire('refresh'):
+            log.debug('token is being refreshed by another process')
+            return False
+
+        try:
+            return self._request_refresh()
+        finally:
+            self._shared.release('refresh')
+
+    def _request_refresh(self):
+        response = self._transport.get('/api/refreshToken')
 
         call_successful = response.status_code == 200
 
         if call_successful:
             self._ts_bearer = response.json()['token']
             self._ts_bearer_expiry = response.json()['expires']
+            self._transport.set_bearer(self._ts_bearer)
+            self._save_state()
+        elif response.status_code == 401:
+            self._token_rejected()
 
-        refresh_interval = 60 * 60 * 1  # every 1 hours
+        log.debug('refreshed bearer token, successful=%s', call_successful)
 
-        log.debug('refreshed bearer token, successful=%s, next refresh in %s seconds', call_successful, refresh_interval)
+        if call_successful:
+            self._schedule_refresh()
 
-        Timer(refresh_interval, self._refresh_token).start()
+        return call_successful
 
     def get_devices(self):
         """Get list of ``OnOffDevice`` connected to tellstick.
 
+        Device list is cached, within cache ttl no call is made to tellstick.
+        After ttl the cached list is returned while it is refreshed in the
+        background.
+
         :returns: ``[OnOffDevice]``
         """
-        if not self._try_dicovered_and_authorized():
-            log.warning('Cannot return any devices, stick is not authenticated and autorized against tellstick')
-            return self._devices.values()  # return cached values
+        devices = self._device_cache.get()
+        return devices if devices is not None else self._registry.devices()
+
+    @property
+    def address(self):
+        """Get tellstick address, ``None`` until discovered."""
+        return self._ts_address
+
+    @property
+    def credentials(self):
+        """Get tellstick address and bearer token, without any discovery or authorization.
+
+        :returns: ``(String, String)``, or ``None`` until discovered and authorized
+        """
+        address, bearer = self._ts_address, self._ts_bearer
+        return (address, bearer) if address is not None and bearer is not None else None
+
+    @property
+    def breaker(self):
+        """Get circuit breaker guarding calls to tellstick.
+
+        :returns: ``CircuitBreaker``
+        """
+        return self._transport.breaker
+
+    @property
+    def retries(self):
+        """Get number of retries of a failed power command.
+
+        :returns: ``Integer``
+        """
+        return self._retries
+
+    def authorized(self):
+        """Discover and authorize, unless already done.
+
+        Blocks while discovery and authorization is done, see ``credentials``.
+
+        :returns: ``Boolean`` if discovered and authorized
+        """
+        try:
+            return self._try_dicovered_and_authorized()
+        except (RuntimeError, requests.RequestException) as err:
+            log.debug('failed to discover and authorize: %s', err)
+            return False
+
+    def lookup(self, name):
+        """Get already discovered ``OnOffDevice`` by name, without any discovery.
+
+        :param name: ``String`` identifier.
+        :returns: ``OnOffDevice`` or ``None``
+        """
+        return self._registry.get(name)
+
+    def registry_version(self):
+        """Get device registry version, changes whenever any device changes.
+
+        :returns: ``Integer``
+        """
+        return self._registry.version
+
+    def command_stats(self):
+        """Get command queue counters.
+
+        :returns: ``Dict``
+        """
+        return self._commands.stats()
+
+    def breaker_stats(self):
+        """Get circuit breaker state and recent failures.
+
+        :returns: ``Dict``
+        """
+        return self._transport.breaker.stats()
+
+    def cache_stats(self):
+        """Get device list cache counters.
+
+        :returns: ``Dict``
+        """
+        return {
+            'devices': self._device_cache.stats(),
+            'unknown_names': self._unknown_names.stats()
+        }
 
-        response = requests.get('http://%s/api/devices/list' % self._ts_address,
-                                headers={'Authorization': 'Bearer %s' % self._ts_bearer})
+    @instrumented('list_devices', failed=(None,))
+    def _list_devices(self):
+        """List devices, loader for device list cache.
+
+        With shared state, a listing made by another worker process within
+        cache ttl is used as is, and only one process at a time lists devices
+        from tellstick.
+
+        :returns: ``[OnOffDevice]``, or ``None`` if listing failed
+        """
+        if self._shared is None:
+            listed_at = time.time()
+            raw_devices = self._fetch_devices()
+        else:
+            listed_at, raw_devices = self._shared.devices()
+            while listed_at is None or time.time() - listed_at >= self._device_cache_ttl:
+                if self._shared.acquire('list', LIST_LEASE_TTL):
+                    try:
+                        listed_at = time.time()
+                        raw_devices = self._fetch_devices()
+                        if raw_devices is not None:
+                            self._shared.save_devices(raw_devices, listed_at)
+                    finally:
+                        self._shared.release('list')
+                    break
+
+                if raw_devices is not None:
+                    log.debug('devices are being listed by another process, using latest shared listing')
+                    break
+
+                time.sleep(SHARED_POLL_INTERVAL)  # never listed, wait for the process listing now
+                listed_at, raw_devices = self._shared.devices()
+
+        if raw_devices is None:
+            return None
+
+        self._apply_listing(raw_devices, listed_at)
+
+        return self._registry.devices()
+
+    def _fetch_devices(self):
+        """List devices from tellstick.
+
+        :returns: ``[Dict]`` devices as listed by tellstick, or ``None`` if listing failed
+        """
+        try:
+            response = self._get_devices_list()
+        except (CircuitOpenError, requests.ConnectionError) as err:
+            if not self.rediscover():
+                log.debug('failed to get devices, returning cached device list: %s', err)
+                return None
+            try:
+                response = self._get_devices_list()
+            except (RuntimeError, requests.RequestException) as err:
+                log.debug('failed to get devices, returning cached device list: %s', err)
+                return None
+        except (RuntimeError, requests.RequestException) as err:  # e.g. failed authorization
+            log.debug('failed to get devices, returning cached device list: %s', err)
+            return None
+
+        if response is None:
+            log.warning('Cannot return any devices, stick is not authenticated and autorized against tellstick')
+            return None
 
         if response.status_code != 200:
             log.debug('failed to get devices, returning cached device list')
-            return self._devices.values()  # return cached values
+            if response.status_code == 401:
+                self._token_rejected()
+            return None
 
         try:
-            raw_devices = response.json()
-        except ValueError as err:
+            raw_devices = response.json()['device']
+        except (ValueError, KeyError) as err:
             log.warning('Failed to parse response from tellstick: %s', err)
-            return self._devices.values()  # return cached values
+            return None
+
+        log.debug('discovered %i devices', len(raw_devices))
+
+        return raw_devices
 
-        log.debug('discovered %i devices', len(raw_devices['device']))
+    def _get_devices_list(self):
+        """Discover and authorize if needed, and request device listing.
 
-        for raw_device in raw_devices['device']:
-            name = raw_device['name']
-            if name not in self._devices:
-                self._devices[name] = OnOffDevice(name, raw_device, self)
+        :returns: ``requests.Response``, or ``None`` if not discovered and authorized
+        """
+        if not self._try_dicovered_and_authorized():
+            return None
 
-        return list(self._devices.values())
+        return self._transport.get('/api/devices/list', params={'supportedMethods': SUPPORTED_METHODS})
+
+    def _apply_listing(self, raw_devices, listed_at):
+        """Register new devices and update state of known ones from listing.
+
+        State is not updated for devices with a command pending, or sent
+        after listing was requested, listing may show state from before it.
+
+        :param raw_devices: ``[Dict]`` devices as listed by tellstick
+        :param listed_at: ``Float`` unix time listing was requested
+        """
+        added = self._registry.update(raw_devices,
+                                      lambda raw_device: OnOffDevice(raw_device['name'], raw_device, self._commands))
+
+        if added:
+            self._unknown_names.clear()  # names previously not found may exist now
+
+        changed = self._registry.reconcile(raw_devices, lambda id: self._commands.changed_since(id, listed_at))
+        log.debug('power state changed outside stick for %i devices', changed)
+        self._changed_outside = changed
+
+        if self._reconciler is not None:
+            self._reconciler.start()  # started on first successful listing, keeps state in sync
+
+    def reconcile(self):
+        """List devices and update state of those changed outside stick.
+
+        Power commands sent by stick meanwhile are not counted, so reconciler
+        interval only adapts to changes made outside stick.
+
+        :returns: ``Integer`` number of devices changed outside stick, found by this pass
+        """
+        self._changed_outside = 0
+        self._device_cache.refresh()
+        return self._changed_outside
 
     def get_device(self, name):
         """Get ``OnOffDevice`` by name.
 
+        See ``get_devices_by_name`` for when discovery is done.
+
         :param name: ``String`` identifier.
         :returns: ``OnOffDevice`` or ``None``
         """
-        if name not in self._devices:
-            self.get_devices()  # re-discover
+        return self.get_devices_by_name([name])[name]
+
+    def get_devices_by_name(self, names):
+        """Get several ``OnOffDevice`` by name, in one pass.
+
+        Discovery is done at most once, and only if any name is unknown and
+        not recently looked up without being found. Concurrent lookups share
+        the same discovery.
+
+        :param names: ``[String]`` identifiers.
+        :returns: ``Dict`` name to ``OnOffDevice`` or ``None``
+        """
+        unknown = [name for name in names if name not in self._registry and name not in self._unknown_names]
+
+        if unknown:
+            self._device_cache.refresh()  # re-discover
+
+            for name in unknown:
+                if name not in self._registry:
+                    self._unknown_names.add(name)
 
-        if name in self._devices:
-            return self._devices[name]
+        return {name: self._registry.get(name) for name in names}
 
-        return None
+    def retry_delay(self, attempt):
+        """Get random wait before retrying a failed power command, doubled for every retry.
+
+        :param attempt: ``Integer`` attempt of command, first retry is 1
+        :returns: ``Float`` seconds
+        """
+        return random.uniform(0, self._retry_backoff * 2 ** (attempt - 1))  # full jitter
 
+    @instrumented('power')
     def power(self, id, on_off):
         """Set power for device with Id.
 
+        A command failed by a server error, a rejected token or a connection
+        error is retried, with a random wait that doubles for every retry.
+        If tellstick does not accept the token of the first call, token is
+        refreshed, or authorization is done again if token was rejected,
+        before retrying. Nothing is sent while the circuit breaker is open.
+
         :param id: ``String`` telldus device id
         :param on_off: ``Boolean`` power state
         """
-        if not self._try_dicovered_and_authorized():
+        power_action = 'turnOn' if on_off else 'turnOff'
+
+        for attempt in range(1 + self._retries):
+            if attempt > 0:
+                time.sleep(self.retry_delay(attempt))
+
+            try:
+                if not self._try_dicovered_and_authorized():
+                    return False
+
+                response = self._transport.get('/api/device/%s' % power_action, params={'id': id})
+
+                if response.status_code == 200:
+                    break
+
+                log.debug('call state was not successful (%s)', response.status_code)
+
+                if not self.call_failed(response.status_code, attempt):
+                    return False
+            except CircuitOpenError as err:
+                if not self.rediscover():
+                    log.debug('tellstick action %s not sent: %s', id, err)
+                    return False
+            except requests.ConnectionError as err:
+                log.debug('tellstick action %s failed, attempt=%i: %s', id, attempt, err)
+                self.rediscover()
+            except requests.RequestException as err:
+                log.debug('tellstick action %s failed, attempt=%i: %s', id, attempt, err)
+            except RuntimeError as err:  # e.g. failed discovery or authorization
+                log.debug('tellstick action %s not sent: %s', id, err)
+                return False
+        else:
             return False
 
-        power_action = 'turnOn' if on_off else 'turnOff'
+        try:
+            status = response.json()['status']
+        except (ValueError, KeyError) as err:
+            log.warning('Failed to parse response from tellstick: %s', err)
+            return False
 
-        response = requests.get('http://%s/api/device/%s' % (self._ts_address, power_action),
-                                params={'id': id},
-                                headers={'Authorization': 'Bearer %s' % self._ts_bearer})
+        log.debug('tellstick action %s, code=%s, status=%s', id, response.status_code, status)
 
-        call_successful = response.status_code == 200
-        if not call_successful:
-            log.debug('call state was not successful (%s), will force token refresh', response.status_code)
-            self._bearer = None
-            self._refresh_token()
+        if status == 'success' and self._shared is not None:
+            self._shared.set_device_state(id, LISTED_STATE[on_off])  # seen by other processes on next listing
+
+        return status == 'success'
 
-        log.debug('tellstick action %s, code=%s, status=%s', id, response.status_code, response.json()['status'])
-        return call_successful and response.json()['status'] == 'success'
+    def close(self):
+        """Stop token refresh and reconciliation, and close connections."""
+        self._refresher.stop()
+        if self._reconciler is not None:
+            self._reconciler.stop()
+        self._transport.close()
@@ -0,0 +1,100 @@
+"""Token refresh scheduler, one thread per Tellstick client."""
+
+from threading import Condition, Thread
+import logging as loggr
+import time
+
+log = loggr.getLogger('smrt')
+
+REFRESH_MARGIN = 60 * 60 * 24  # refresh at most a day ahead of expiry
+RETRY_INTERVAL = 60  # seconds between attempts after a failed refresh
+
+
+class TokenRefresher:
+    """TokenRefresher, refreshes bearer token ahead of its expiry.
+
+    A single daemon thread sleeps until the token is due for refresh.
+    Refreshes requested while one is already running wait for that refresh
+    instead of starting another.
+    """
+
+    def __init__(self, refresh):
+        """Create TokenRefresher, thread is started on first ``schedule``.
+
+        :param refresh: ``Callable`` performing refresh, returns ``Boolean`` success
+        """
+        self._refresh = refresh
+        self._condition = Condition()
+        self._due = None  # monotonic time of next refresh, ``None`` if nothing scheduled
+        self._refreshing = False
+        self._last_result = False
+        self._stopped = False
+        self._thread = None
+
+    def schedule(self, expiry):
+        """Schedule next refresh ahead of token expiry.
+
+        :param expiry: ``Integer`` unix time when token expires
+        """
+        remaining = max(0, expiry - time.time())
+        delay = remaining - min(REFRESH_MARGIN, remaining / 2)
+
+        with self._condition:
+            self._due = time.monotonic() + delay
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name='tellstick-token-refresh', daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+        log.debug('next token refresh in %i seconds', delay)
+
+    def refresh_now(self):
+        """Refresh token now, or wait for a refresh already in progress.
+
+        :returns: ``Boolean`` if refresh was successful
+        """
+        with self._condition:
+            if self._refreshing:
+                while self._refreshing:
+                    self._condition.wait()
+                return self._last_result
+
+            self._refreshing = True
+
+        successful = False
+        try:
+            successful = self._refresh()
+        finally:
+            with self._condition:
+                self._refreshing = False
+                self._last_result = successful
+                if not successful and self._thread is not None:
+                    self._due = time.monotonic() + RETRY_INTERVAL
+                self._condition.notify_all()
+
+        return successful
+
+    def stop(self):
+        """Stop refresh thread."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped and (self._due is None or self._due > time.monotonic()):
+                    timeout = None if self._due is None else self._due - time.monotonic()
+                    self._condition.wait(timeout)
+
+                if self._stopped:
+                    return
+
+                self._due = None  # rescheduled by successful refresh, or retried on failure
+
+            try:
+                self.refresh_now()
+            except Exception as err:
+                log.warning('token refresh failed: %s', err)
+                with self._condition:
+                    self._due = time.monotonic() + RETRY_INTERVAL
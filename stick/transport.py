@@ -0,0 +1,151 @@
+"""Pooled keep-alive HTTP transport for the Tellstick local API."""
+
+import logging as loggr
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from stick.breaker import FAILURE_THRESHOLD, RESET_TIMEOUT, CircuitBreaker, CircuitOpenError
+from stick.metrics import REGISTRY
+
+log = loggr.getLogger('smrt')
+
+REQUEST_SECONDS = REGISTRY.histogram('stick_tellstick_request_seconds',
+                                     'Latency of tellstick api calls.', ['method', 'path'])
+REQUESTS = REGISTRY.counter('stick_tellstick_requests_total',
+                            'Tellstick api calls by outcome.', ['method', 'path', 'outcome'])
+
+
+class Transport:
+    """Transport, one keep-alive session shared by every Tellstick API call.
+
+    The session keeps a pool of open connections to the Tellstick, so
+    consecutive calls do not pay a new TCP handshake. Bearer token is set
+    once on the session, and every call has connect and read timeouts.
+
+    All calls go through a circuit breaker. Connection errors, timeouts and
+    server errors count as failures, and while the breaker is open calls
+    fail fast with ``CircuitOpenError`` instead of waiting for timeouts.
+    """
+
+    def __init__(self, address=None, pool_size=10, connect_timeout=3.05, read_timeout=10,
+                 failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        """Create and initialize Transport.
+
+        :param address: ``String`` tellstick address, can be set later
+        :param pool_size: ``Integer`` max number of kept-alive connections
+        :param connect_timeout: ``Float`` seconds to wait for connection
+        :param read_timeout: ``Float`` seconds to wait for response
+        :param failure_threshold: ``Integer`` consecutive failures before breaker opens
+        :param reset_timeout: ``Float`` seconds breaker stays open before probing
+        """
+        self._address = address
+        self._timeout = (connect_timeout, read_timeout)
+        self._auth_headers = {}  # replaced, never mutated, as calls read it from several threads
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._session.mount('http://', adapter)
+
+        self._breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+        log.debug('transport created, pool_size=%s, timeout=%s', pool_size, self._timeout)
+
+    @property
+    def timeout(self):
+        """Get ``(connect, read)`` timeout tuple used for calls.
+
+        :returns: ``Tuple``
+        """
+        return self._timeout
+
+    @property
+    def breaker(self):
+        """Get circuit breaker guarding calls.
+
+        :returns: ``CircuitBreaker``
+        """
+        return self._breaker
+
+    def set_address(self, address):
+        """Set tellstick address used for all calls.
+
+        Breaker is closed when address changes, failures were of the previous address.
+
+        :param address: ``String`` tellstick address
+        """
+        if address != self._address:
+            self._breaker.success()
+        self._address = address
+
+    def set_bearer(self, bearer):
+        """Set bearer token sent with all calls.
+
+        :param bearer: ``String`` token, or ``None`` to remove
+        """
+        self._auth_headers = {} if bearer is None else {'Authorization': 'Bearer %s' % bearer}
+
+    def get(self, path, params=None):
+        """Perform GET against tellstick api.
+
+        :param path: ``String`` api path, e.g. ``/api/devices/list``
+        :param params: ``Dict`` query parameters
+        :returns: ``requests.Response``
+        """
+        return self._request('GET', path, params=params)
+
+    def put(self, path, params=None, data=None):
+        """Perform PUT against tellstick api.
+
+        :param path: ``String`` api path
+        :param params: ``Dict`` query parameters
+        :param data: ``Dict`` form data
+        :returns: ``requests.Response``
+        """
+        return self._request('PUT', path, params=params, data=data)
+
+    def post(self, path, params=None, data=None):
+        """Perform POST against tellstick api.
+
+        :param path: ``String`` api path
+        :param params: ``Dict`` query parameters
+        :param data: ``Dict`` form data
+        :returns: ``requests.Response``
+        """
+        return self._request('POST', path, params=params, data=data)
+
+    def close(self):
+        """Close all pooled connections."""
+        self._session.close()
+
+    def _request(self, method, path, **kwargs):
+        try:
+            self._breaker.before_call()
+        except CircuitOpenError:
+            REQUESTS.inc(method, path, 'rejected')
+            raise
+
+        started = time.perf_counter()
+        try:
+            response = self._session.request(method, self._url(path), headers=self._auth_headers,
+                                             timeout=self._timeout, **kwargs)
+        except requests.RequestException as err:
+            REQUEST_SECONDS.observe(time.perf_counter() - started, method, path)
+            REQUESTS.inc(method, path, 'error')
+            self._breaker.failure(err)
+            raise
+
+        REQUEST_SECONDS.observe(time.perf_counter() - started, method, path)
+
+        if response.status_code >= 500:
+            REQUESTS.inc(method, path, 'failure')
+            self._breaker.failure('%s %s answered %s' % (method, path, response.status_code))
+        else:
+            REQUESTS.inc(method, path, 'success')
+            self._breaker.success()
+
+        return response
+
+    def _url(self, path):
+        return 'http://%s%s' % (self._address, path)
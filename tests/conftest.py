@@ -0,0 +1,53 @@
+"""Fixtures for api tests, stick application with stub configuration against a fake tellstick."""
+
+import importlib
+
+import pytest
+import smrt
+
+from tests.fake_tellstick import FakeTellstick
+
+GROUPS = [{'name': 'floor', 'devices': ['device-1', 'device-2', 'device-9']}]
+
+_config = {
+    'tellstick_api': {'username': 'user', 'password': 'secret', 'address': '127.0.0.1:1'},
+    'switches': []
+}
+
+
+def _configure(self, schemas_path, schema_name):
+    """Use stub configuration instead of configuration file given to smrt."""
+    self._config = _config
+
+
+smrt.SMRTApp.__init__ = _configure  # stick.app creates an application when imported, nothing is called until used
+
+
+@pytest.fixture
+def fake_tellstick():
+    with FakeTellstick() as fake:
+        yield fake
+
+
+@pytest.fixture
+def application(fake_tellstick, monkeypatch):
+    """Stick application against fake tellstick, replacing the one created on import."""
+    monkeypatch.setitem(_config, 'tellstick_api', {'username': 'user', 'password': 'secret',
+                                                   'address': fake_tellstick.address,
+                                                   'reconcile': {'enabled': False}})
+    monkeypatch.setitem(_config, 'groups', GROUPS)
+    monkeypatch.setitem(_config, 'scheduler', {'min_interval': 0.05})
+
+    stick_app = importlib.import_module('stick.app')
+    application = stick_app.Stick()
+    monkeypatch.setattr(stick_app, 'stick', application)
+
+    yield application
+
+    application._scheduler.stop()
+
+
+@pytest.fixture
+def api(application):
+    """Flask test client for stick api."""
+    return importlib.import_module('stick.app').app.test_client()
@@ -0,0 +1,186 @@
+"""In-process fake Tellstick local API, used by tests and benchmarks."""
+
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from urllib.parse import parse_qs, urlparse
+import json
+import random
+import socket
+import time
+
+TURNON = 1
+TURNOFF = 2
+
+DISCOVERY_ANSWER = b'TellStickNet:ACCA54000000:fakecode:1.3.0:fakefirmware'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, as the real tellstick
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):  # noqa: A002, keep test output quiet
+        pass
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.server.fake._connection_opened()
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def _dispatch(self, method):
+        length = int(self.headers.get('Content-Length', 0))
+        if length:
+            self.rfile.read(length)
+
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        code, body = self.server.fake._handle(method, url.path, params, self.headers.get('Authorization'))
+
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # bursts of new connections must not overflow backlog
+
+
+class FakeTellstick:
+    """Fake Tellstick, serves the local api and telldus live login on localhost.
+
+    Usable as context manager, server is started on enter and stopped on exit.
+    """
+
+    def __init__(self, devices=10, latency=0.0, failure_rate=0.0, token='fake-bearer', expires_in=3600,
+                 allow_renew=True):
+        """Create FakeTellstick.
+
+        :param devices: ``Integer`` number of devices to serve
+        :param latency: ``Float`` seconds added to every response
+        :param failure_rate: ``Float`` share of device commands answered with 500
+        :param token: ``String`` bearer token handed out after login
+        :param expires_in: ``Integer`` seconds until handed out tokens expire
+        :param allow_renew: ``Boolean`` if token refresh is allowed
+        """
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.token = token
+        self.expires_in = expires_in
+        self.allow_renew = allow_renew
+        self.devices = {i: {'id': i, 'name': 'device-%i' % i, 'state': TURNOFF, 'methods': TURNON | TURNOFF}
+                        for i in range(1, devices + 1)}
+
+        self.connections = 0
+        self.calls = Counter()
+
+        self._lock = Lock()
+        self._server = None
+        self._thread = None
+        self._discovery_socket = None
+
+    @property
+    def address(self):
+        """Get ``host:port`` address of running server."""
+        host, port = self._server.server_address[:2]
+        return '%s:%s' % (host, port)
+
+    @property
+    def discovery_address(self):
+        """Get ``(host, port)`` where discovery is answered, see ``tellstick.DISCOVERY_ADDRESS``."""
+        return self._discovery_socket.getsockname()
+
+    def start(self):
+        """Start serving api and answering discovery in background threads."""
+        self._server = _Server(('127.0.0.1', 0), _Handler)
+        self._server.fake = self
+        self._thread = Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+        self._discovery_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._discovery_socket.bind(('127.0.0.1', 0))
+        Thread(target=self._answer_discovery, args=(self._discovery_socket,), daemon=True).start()
+        return self
+
+    def stop(self):
+        """Stop server."""
+        self._server.shutdown()
+        self._server.server_close()
+        self._discovery_socket.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _connection_opened(self):
+        with self._lock:
+            self.connections += 1
+
+    def _answer_discovery(self, sock):
+        while True:
+            try:
+                data, sender = sock.recvfrom(1024)
+            except OSError:
+                return  # closed
+
+            if data == b'D':
+                with self._lock:
+                    self.calls['discovery'] += 1
+                sock.sendto(DISCOVERY_ANSWER, sender)
+
+    def _handle(self, method, path, params, authorization):
+        with self._lock:
+            self.calls[path] += 1
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if path == '/api/token' and method == 'PUT':
+            return 200, {'authUrl': 'http://%s/live/auth' % self.address, 'token': 'request-token'}
+        if path == '/live/auth':
+            return 200, {}
+        if path == '/api/authorize':
+            return 200, {}
+        if path == '/api/token':
+            return 200, self._token_body()
+
+        if authorization != 'Bearer %s' % self.token:
+            return 401, {'error': 'The request requires user authentication'}
+
+        if path == '/api/refreshToken':
+            if not self.allow_renew:
+                return 403, {'error': 'renewal not allowed'}
+            return 200, self._token_body()
+        if path == '/api/devices/list':
+            return 200, {'device': list(self.devices.values())}
+        if path in ('/api/device/turnOn', '/api/device/turnOff'):
+            if self.failure_rate and random.random() < self.failure_rate:
+                return 500, {'error': 'internal error'}
+            device = self.devices.get(int(params.get('id', 0)))
+            if device is None:
+                return 404, {'error': 'Device not found'}
+            device['state'] = TURNON if path.endswith('turnOn') else TURNOFF
+            return 200, {'status': 'success'}
+
+        return 404, {'error': 'not found'}
+
+    def _token_body(self):
+        return {
+            'token': self.token,
+            'expires': int(time.time()) + self.expires_in,
+            'allowRenew': self.allow_renew
+        }
@@ -0,0 +1,217 @@
+import time
+
+import pytest
+
+from stick.commandqueue import AUTOMATION
+from stick.jobs import COMPLETED, PENDING, ROLLED_BACK
+from stick.onoffdevice import OnOffDevice
+
+from tests.fake_tellstick import TURNON
+
+
+def test_devices_not_modified_for_same_etag(api):
+    response = api.get('/devices')
+    assert response.status_code == 200
+    assert len(response.get_json()['devices']) == 10
+
+    etag = response.headers['ETag']
+    response = api.get('/devices', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+
+def test_device_etag_changes_with_power(api):
+    etag = api.get('/device/device-1').headers['ETag']
+
+    assert api.put('/device/device-1/power/on').status_code == 204
+
+    response = api.get('/device/device-1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['power'] is True
+    assert response.headers['ETag'] != etag
+
+
+def test_unknown_device_not_found(api):
+    assert api.get('/device/missing').status_code == 404
+
+
+def test_device_named_devices_does_not_collide_with_list(api, fake_tellstick):
+    fake_tellstick.devices[1]['name'] = 'devices'
+
+    listing = api.get('/devices').get_json()
+    device = api.get('/device/devices').get_json()
+
+    assert len(listing['devices']) == 10
+    assert device['name'] == 'devices'
+    assert api.get('/devices').get_json() == listing
+
+
+def test_power_many_by_group_and_names(api):
+    response = api.put('/devices/power', json={'devices': ['device-3', 'device-1', 'missing'],
+                                               'group': 'floor', 'power': 'on'})
+    assert response.status_code == 200
+
+    results = response.get_json()['devices']
+    assert [result['name'] for result in results] == ['device-3', 'device-1', 'missing', 'device-2', 'device-9']
+    assert results[2] == {'name': 'missing', 'successful': False, 'error': 'NotFound'}
+    assert all(result['successful'] and result['power'] is True for result in results if result['name'] != 'missing')
+
+
+def test_power_many_unknown_group_not_found(api):
+    assert api.put('/devices/power', json={'group': 'attic', 'power': 'off'}).status_code == 404
+
+
+@pytest.mark.parametrize('body', [
+    {'power': 'on'},
+    {'devices': ['device-1'], 'power': 'dim'},
+    {'devices': 'device-1', 'power': 'on'},
+    {'group': ['floor'], 'power': 'on'},
+    {'group': {'name': 'floor'}, 'power': 'on'}
+])
+def test_power_many_invalid_body(api, body):
+    assert api.put('/devices/power', json=body).status_code == 400
+
+
+def test_power_many_queued_with_automation_priority(api, monkeypatch):
+    priorities = []
+    submit_power = OnOffDevice.submit_power
+
+    def recording(device, on_off, priority):
+        priorities.append(priority)
+        return submit_power(device, on_off, priority)
+
+    monkeypatch.setattr(OnOffDevice, 'submit_power', recording)
+
+    assert api.put('/devices/power', json={'group': 'floor', 'power': 'toggle'}).status_code == 200
+    assert priorities == [AUTOMATION] * 3
+
+
+def test_events_after_cursor(api):
+    cursor = api.get('/events').get_json()['cursor']
+
+    api.get('/devices')
+    assert api.put('/device/device-1/power/on').status_code == 204
+
+    response = api.get('/events?cursor=%s&timeout=1' % cursor)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['events'] and not body['reset']
+    assert body['cursor'] == body['events'][-1]['cursor']
+    assert {'device': 'device-1', 'power': True} in [{key: event.get(key) for key in ('device', 'power')}
+                                                     for event in body['events']]
+
+
+@pytest.mark.parametrize('cursor', ['1000000', 'restarted-0'])
+def test_events_foreign_cursor_is_reset_without_waiting(api, cursor):
+    cursor_latest = api.get('/events').get_json()['cursor']
+
+    start = time.monotonic()
+    body = api.get('/events?cursor=%s&timeout=30' % cursor).get_json()
+
+    assert body['reset'] and body['events'] == [] and body['cursor'] == cursor_latest
+    assert time.monotonic() - start < 5
+
+
+def test_events_invalid_timeout(api):
+    assert api.get('/events?cursor=0&timeout=soon').status_code == 400
+
+
+def _finished_job(api, location):
+    for _ in range(100):
+        job = api.get(location).get_json()
+        if job['status'] != PENDING:
+            return job
+        time.sleep(0.02)
+    return job
+
+
+@pytest.mark.parametrize('path, headers', [
+    ('/device/device-1/power/on', {'Prefer': 'respond-async'}),
+    ('/device/device-1/power/on?async=true', {})
+])
+def test_async_power_accepted_as_job(api, fake_tellstick, path, headers):
+    response = api.put(path, headers=headers)
+
+    assert response.status_code == 202
+    job = response.get_json()
+    assert response.headers['Location'].endswith('/jobs/%s' % job['id'])
+    assert job['device'] == 'device-1' and job['power'] is True
+
+    assert _finished_job(api, '/jobs/%s' % job['id'])['status'] == COMPLETED
+    assert fake_tellstick.devices[1]['state'] == TURNON
+
+
+def test_failed_async_power_rolled_back(api, fake_tellstick):
+    assert api.get('/device/device-1').get_json()['power'] is False
+    fake_tellstick.failure_rate = 1.0
+
+    response = api.put('/device/device-1/power/toggle', headers={'Prefer': 'respond-async'})
+    assert response.status_code == 202
+
+    assert _finished_job(api, response.headers['Location'])['status'] == ROLLED_BACK
+    assert api.get('/device/device-1').get_json()['power'] is False
+
+
+def test_unknown_job_not_found(api):
+    assert api.get('/jobs/missing').status_code == 404
+
+
+def test_metrics_in_prometheus_text_format(api, fake_tellstick):
+    api.get('/devices')
+    api.get('/device/missing')
+
+    response = api.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+
+    text = response.get_data(as_text=True)
+    assert '# TYPE stick_http_request_seconds histogram' in text
+    assert 'stick_http_requests_total{method="GET",route="/devices",status="200"}' in text
+    assert 'stick_http_requests_total{method="GET",route="/device/<string:name>",status="404"}' in text
+    assert 'stick_operations_total{operation="list_devices",outcome="success"}' in text
+    assert 'stick_circuit_breaker_open{controller="%s"} 0' % fake_tellstick.address in text
+
+
+def test_schedule_created_listed_and_deleted(api):
+    response = api.post('/schedules', json={'group': 'floor', 'power': 'off', 'every': 3600})
+    assert response.status_code == 201
+    schedule = response.get_json()
+    assert schedule['group'] == 'floor' and schedule['every'] == 3600
+    location = '/schedules/%s' % schedule['id']
+    assert response.headers['Location'].endswith(location)
+
+    assert api.get(location).get_json() == schedule
+    assert api.get('/schedules').get_json() == {'schedules': [schedule]}
+
+    assert api.delete(location).status_code == 204
+    assert api.get(location).status_code == 404
+    assert api.delete(location).status_code == 404
+
+
+def test_schedule_runs_at_time(api, fake_tellstick):
+    response = api.post('/schedules', json={'devices': ['device-1'], 'power': 'on', 'at': time.time() + 0.05})
+    assert response.status_code == 201
+
+    for _ in range(100):
+        if fake_tellstick.devices[1]['state'] == TURNON:
+            break
+        time.sleep(0.02)
+
+    assert fake_tellstick.devices[1]['state'] == TURNON
+    assert api.get('/schedules').get_json() == {'schedules': []}  # ran once
+
+
+def test_schedule_unknown_group_not_found(api):
+    assert api.post('/schedules', json={'group': 'attic', 'power': 'on', 'every': 60}).status_code == 404
+
+
+@pytest.mark.parametrize('body', [
+    '{"devices": ["device-1"], "power": "on"}',
+    '{"devices": ["device-1"], "power": "on", "at": "noon"}',
+    '{"devices": ["device-1"], "power": "on", "at": NaN}',
+    '{"devices": ["device-1"], "power": "on", "every": Infinity}',
+    '{"devices": ["device-1"], "power": "on", "every": 0.01}',
+    '{"power": "on", "every": 60}'
+])
+def test_schedule_invalid_body(api, body):
+    assert api.post('/schedules', data=body, content_type='application/json').status_code == 400
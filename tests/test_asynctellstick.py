@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+from stick.asynctellstick import AsyncTellstick, BlockingTellstick
+from stick.tellstick import Tellstick
+
+from tests.fake_tellstick import FakeTellstick, TURNON
+
+
+def test_get_devices_and_power():
+    async def run(fake):
+        client = AsyncTellstick('user', 'secret', address=fake.address)
+
+        devices = await client.get_devices()
+        assert len(devices) == 10
+
+        device = await client.get_device('device-3')
+        assert await client.set_power(device, True)
+        assert device.json()['power'] is True
+
+        assert await client.get_device('unknown') is None
+
+        await client.close()
+
+    with FakeTellstick() as fake:
+        asyncio.run(run(fake))
+        assert fake.devices[3]['state'] == TURNON
+        assert fake.calls['/api/authorize'] == 1
+
+
+def test_power_many_is_concurrent():
+    async def run(fake):
+        client = AsyncTellstick('user', 'secret', address=fake.address, transport={'pool_size': 20})
+        await client.get_devices()
+
+        start = time.perf_counter()
+        results = await client.power_many([(id, True) for id in fake.devices])
+        elapsed = time.perf_counter() - start
+
+        await client.close()
+        return results, elapsed
+
+    with FakeTellstick(devices=20, latency=0.05) as fake:
+        results, elapsed = asyncio.run(run(fake))
+
+        assert all(results)
+        assert elapsed < 20 * 0.05 / 2  # serial calls would take 1 second
+        assert all(device['state'] == TURNON for device in fake.devices.values())
+
+
+def test_blocking_wrapper():
+    with FakeTellstick() as fake:
+        client = BlockingTellstick(AsyncTellstick('user', 'secret', address=fake.address))
+
+        device = client.get_device('device-1')
+        assert device.set_power(True)
+        assert device.toggle_power()
+        assert device.json()['power'] is False
+
+        client.close()
+
+
+def test_authorization_shared_with_tellstick(tmp_path):
+    state_file = str(tmp_path / 'state.json')
+
+    async def run(fake):
+        client = AsyncTellstick('user', 'secret', address=fake.address, state_file=state_file)
+        devices = await client.get_devices()
+        await client.close()
+        return devices
+
+    with FakeTellstick() as fake:
+        Tellstick('user', 'secret', address=fake.address, state_file=state_file).get_devices()
+
+        assert len(asyncio.run(run(fake))) == 10
+        assert fake.calls['/api/authorize'] == 1  # persisted token reused
+
+
+def test_failed_power_retried_as_by_tellstick():
+    async def run(fake):
+        client = AsyncTellstick('user', 'secret', address=fake.address, commands={'retry_backoff': 0})
+        fake.failure_rate = 1.0
+        failed = await client.power(1, True)
+        fake.failure_rate = 0.0
+        unknown = await client.power(404, True)
+        await client.close()
+        return failed, unknown
+
+    with FakeTellstick() as fake:
+        assert asyncio.run(run(fake)) == (False, False)
+        assert fake.calls['/api/device/turnOn'] == 3 + 1  # server error retried twice, unknown device not retried
+        assert fake.calls['/api/refreshToken'] == 0
@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+from stick.asynctransport import AsyncTransport
+from stick.breaker import CLOSED, CircuitBreaker
+
+from tests.fake_tellstick import FakeTellstick
+
+
+@pytest.mark.parametrize('head', [b'HTTP/1.1 204 No Content\r\n\r\n', b'HTTP/1.1 304 Not Modified\r\n\r\n'])
+def test_bodiless_response_read_without_waiting_for_close(head):
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(head)  # connection kept open
+        return await asyncio.wait_for(AsyncTransport._read_response(reader), 1)
+
+    status_code, keep_alive, content = asyncio.run(run())
+    assert content == b'' and keep_alive
+
+
+def test_cancelled_probe_does_not_lock_breaker():
+    async def run(fake):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.1)
+        transport = AsyncTransport(fake.address, breaker=breaker)
+        breaker.failure('refused')
+        await asyncio.sleep(0.1)
+
+        fake.latency = 0.5
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(transport.get('/api/devices/list'), 0.05)  # probe cancelled
+
+        fake.latency = 0.0
+        await asyncio.sleep(0.1)
+        response = await transport.get('/api/devices/list')
+        await transport.close()
+        return response, breaker.state
+
+    with FakeTellstick() as fake:
+        response, state = asyncio.run(run(fake))
+        assert response.status_code == 401  # not authorized, but answered
+        assert state == CLOSED
@@ -0,0 +1,50 @@
+import time
+
+import pytest
+
+from stick.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+
+    breaker.failure('refused')
+    breaker.failure('refused')
+    breaker.success()  # resets count
+    breaker.failure('refused')
+    breaker.failure('refused')
+    assert breaker.state == CLOSED
+
+    breaker.failure('refused')
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_half_open_lets_one_probe_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.1)
+    breaker.failure('refused')
+    time.sleep(0.1)
+    assert breaker.state == HALF_OPEN
+
+    breaker.before_call()  # probe
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.success()
+    assert breaker.state == CLOSED
+    assert breaker.stats()['times_opened'] == 1
+
+
+def test_probe_not_reporting_back_is_given_up():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.1)
+    breaker.failure('refused')
+    time.sleep(0.1)
+
+    breaker.before_call()  # probe, e.g. cancelled before success or failure
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    time.sleep(0.1)
+    breaker.before_call()  # new probe
+    assert breaker.state == HALF_OPEN
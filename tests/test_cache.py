@@ -0,0 +1,86 @@
+from threading import Event, Thread
+import time
+
+from stick.cache import NegativeCache, RefreshingCache
+
+
+class SlowLoader:
+    def __init__(self, delay=0.0):
+        self.calls = 0
+        self.delay = delay
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        return self.calls
+
+
+def test_hit_within_ttl():
+    loader = SlowLoader()
+    cache = RefreshingCache(loader, ttl=60)
+
+    assert cache.get() == 1
+    assert cache.get() == 1
+    assert loader.calls == 1
+    assert cache.stats() == {'hits': 1, 'stale_hits': 0, 'misses': 1, 'loads': 1}
+
+
+def test_stale_value_served_while_refreshing():
+    loader = SlowLoader(delay=0.2)
+    cache = RefreshingCache(loader, ttl=0)
+
+    assert cache.get() == 1
+    start = time.monotonic()
+    assert cache.get() == 1  # stale, refresh started in background
+    assert cache.get() == 1  # stale, refresh already running
+    assert time.monotonic() - start < 0.1
+
+    time.sleep(0.3)
+    assert loader.calls == 2
+    assert cache.get() == 2
+
+
+def test_concurrent_misses_are_coalesced():
+    loader = SlowLoader(delay=0.2)
+    cache = RefreshingCache(loader, ttl=60)
+    start = Event()
+    results = []
+
+    def get():
+        start.wait()
+        results.append(cache.get())
+
+    threads = [Thread(target=get) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    start.set()
+    for thread in threads:
+        thread.join()
+
+    assert loader.calls == 1
+    assert results == [1] * 10
+
+
+def test_failed_load_keeps_value():
+    values = iter([['a'], None])
+    cache = RefreshingCache(lambda: next(values), ttl=60)
+
+    assert cache.get() == ['a']
+    assert cache.refresh() == ['a']
+
+
+def test_negative_cache_expires_and_is_bounded():
+    cache = NegativeCache(ttl=0.1, max_size=2)
+
+    cache.add('a')
+    cache.add('b')
+    cache.add('c')
+    assert 'a' not in cache  # evicted
+    assert 'b' in cache and 'c' in cache
+
+    time.sleep(0.15)
+    assert 'b' not in cache
+
+    cache.add('d')
+    cache.clear()
+    assert 'd' not in cache
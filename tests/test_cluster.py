@@ -0,0 +1,46 @@
+from stick import cluster as cluster_module
+from stick.cluster import TellstickCluster
+
+from tests.fake_tellstick import FakeTellstick, TURNON
+
+
+def test_devices_merged_and_routed_to_owning_controller():
+    with FakeTellstick(devices=2) as first, FakeTellstick(devices=4) as second:
+        for id in (3, 4):
+            second.devices[id]['name'] = 'zone-b-%i' % id
+
+        cluster = TellstickCluster('user', 'secret', addresses=[first.address, second.address],
+                                   reconcile={'enabled': False})
+
+        names = sorted(device.get_name() for device in cluster.get_devices())
+        assert names == ['device-1', 'device-2', 'zone-b-3', 'zone-b-4']
+
+        assert cluster.get_device('zone-b-4').set_power(True)
+        assert second.devices[4]['state'] == TURNON
+        assert first.calls['/api/device/turnOn'] == 0
+
+
+def test_unknown_name_looked_up_on_all_controllers():
+    with FakeTellstick(devices=1) as first, FakeTellstick(devices=1) as second:
+        cluster = TellstickCluster('user', 'secret', addresses=[first.address, second.address],
+                                   reconcile={'enabled': False})
+
+        assert cluster.get_device('missing') is None
+        assert first.calls['/api/devices/list'] == 1
+        assert second.calls['/api/devices/list'] == 1
+
+
+def test_discovery_finding_nothing_is_throttled(monkeypatch):
+    discoveries = []
+    monkeypatch.setattr(cluster_module, 'discover_tellsticks', lambda: discoveries.append(1) or [])
+
+    cluster = TellstickCluster('user', 'secret')
+
+    assert cluster.get_devices() == []
+    assert cluster.get_devices() == []
+    assert cluster.get_device('device-1') is None
+    assert len(discoveries) == 1
+
+    monkeypatch.setattr(cluster_module, 'REDISCOVERY_INTERVAL', 0)
+    assert cluster.get_devices() == []
+    assert len(discoveries) == 2
@@ -0,0 +1,80 @@
+from threading import Event
+import time
+
+from stick.commandqueue import AUTOMATION, INTERACTIVE, CommandQueue
+
+
+class BlockingSender:
+    def __init__(self):
+        self.sent = []
+        self.release = Event()
+
+    def __call__(self, id, on_off):
+        self.release.wait()
+        self.sent.append((id, on_off))
+        return True
+
+
+def test_superseded_commands_are_coalesced():
+    sender = BlockingSender()
+    queue = CommandQueue(sender, rate=1000)
+    updates = []
+
+    in_flight = queue.submit(1, True)
+    time.sleep(0.05)  # first command is being sent
+    futures = [queue.submit(1, on_off, on_done=lambda *args: updates.append(args))
+               for on_off in (False, True, False, True)]
+
+    sender.release.set()
+    assert in_flight.result(1) and all(future.result(1) for future in futures)
+
+    assert sender.sent == [(1, True), (1, True)]
+    assert updates == [(True, True)]
+    assert queue.stats()['coalesced'] == 3
+
+
+def test_interactive_before_automation():
+    sender = BlockingSender()
+    queue = CommandQueue(sender, rate=1000)
+
+    queue.submit(0, True)
+    time.sleep(0.05)
+    queue.submit(1, True, AUTOMATION)
+    queue.submit(2, True, AUTOMATION)
+    last = queue.submit(3, True, INTERACTIVE)
+
+    sender.release.set()
+    last.result(1)
+    time.sleep(0.05)
+
+    assert [id for id, _ in sender.sent] == [0, 3, 1, 2]
+
+
+def test_rate_limited():
+    sender = BlockingSender()
+    sender.release.set()
+    queue = CommandQueue(sender, rate=20)
+
+    start = time.monotonic()
+    futures = [queue.submit(id, True) for id in range(5)]
+    for future in futures:
+        future.result(2)
+
+    assert time.monotonic() - start >= 4 / 20
+
+
+def test_changed_since_covers_pending_in_flight_and_sent():
+    sender = BlockingSender()
+    queue = CommandQueue(sender, rate=1000)
+    listed_at = time.time()
+
+    future = queue.submit(1, True)
+    assert queue.changed_since(1, listed_at)  # pending or in flight
+    time.sleep(0.05)
+    assert queue.changed_since(1, listed_at)  # in flight
+
+    sender.release.set()
+    assert future.result(1)
+    assert queue.changed_since(1, listed_at)  # sent after listing was requested
+    assert not queue.changed_since(1, time.time() + 1)
+    assert not queue.changed_since(2, listed_at)
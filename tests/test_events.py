@@ -0,0 +1,49 @@
+from threading import Timer
+import time
+
+import pytest
+
+from stick.events import EventLog
+
+
+def test_since_cursor():
+    log = EventLog(size=3, instance='a')
+    for i in range(5):
+        log.append({'value': i})
+
+    events, cursor, reset = log.since('a-3')
+    assert [event['value'] for event in events] == [3, 4]
+    assert cursor == 'a-5' and not reset
+
+    events, cursor, reset = log.since('a-0')
+    assert [event['value'] for event in events] == [2, 3, 4]
+    assert reset  # events 1 and 2 are gone
+
+
+def test_since_waits_for_event():
+    log = EventLog(instance='a')
+    Timer(0.1, log.append, args=({'value': 1},)).start()
+
+    start = time.monotonic()
+    events, cursor, _ = log.since(log.cursor, timeout=5)
+
+    assert events == [{'value': 1, 'cursor': 'a-1'}]
+    assert time.monotonic() - start < 1
+
+
+def test_since_times_out():
+    log = EventLog()
+    events, cursor, reset = log.since(log.cursor, timeout=0.05)
+    assert events == [] and cursor == log.cursor and not reset
+
+
+@pytest.mark.parametrize('cursor', ['a-10', 'b-0', 'b-1', '1', 'a-x', None])
+def test_since_foreign_cursor_is_reset_at_once(cursor):
+    log = EventLog(instance='a')
+    log.append({'value': 1})
+
+    start = time.monotonic()
+    events, latest, reset = log.since(cursor, timeout=5)
+
+    assert events == [] and latest == 'a-1' and reset
+    assert time.monotonic() - start < 1
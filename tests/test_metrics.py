@@ -0,0 +1,30 @@
+from stick.metrics import MetricsRegistry
+
+
+def test_render_prometheus_text():
+    registry = MetricsRegistry()
+    requests = registry.counter('requests_total', 'Requests.', ['path'])
+    latency = registry.histogram('latency_seconds', 'Latency.', ['path'], buckets=(0.1, 1.0))
+    registry.collected('pending', 'gauge', 'Pending.', lambda: [({'queue': 'a"b'}, 3)])
+
+    requests.inc('/devices')
+    requests.inc('/devices', amount=2)
+    latency.observe(0.1, '/devices')
+    latency.observe(0.5, '/devices')
+    latency.observe(7, '/devices')
+
+    assert registry.render().splitlines() == [
+        '# HELP latency_seconds Latency.',
+        '# TYPE latency_seconds histogram',
+        'latency_seconds_bucket{path="/devices",le="0.1"} 1',
+        'latency_seconds_bucket{path="/devices",le="1.0"} 2',
+        'latency_seconds_bucket{path="/devices",le="+Inf"} 3',
+        'latency_seconds_count{path="/devices"} 3',
+        'latency_seconds_sum{path="/devices"} 7.6',
+        '# HELP pending Pending.',
+        '# TYPE pending gauge',
+        'pending{queue="a\\"b"} 3',
+        '# HELP requests_total Requests.',
+        '# TYPE requests_total counter',
+        'requests_total{path="/devices"} 3',
+    ]
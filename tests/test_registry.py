@@ -0,0 +1,57 @@
+import sys
+
+from stick.onoffdevice import OnOffDevice
+from stick.registry import DeviceRegistry
+
+
+def _create(raw_device):
+    return OnOffDevice(raw_device['name'], raw_device, None)
+
+
+def test_update_indexes_by_name_and_id():
+    registry = DeviceRegistry()
+
+    added = registry.update([{'id': 1, 'name': 'hall'}, {'id': 2, 'name': 'porch'}], _create)
+
+    assert len(added) == 2
+    assert registry.get('hall') is registry.get_by_id(1)
+    assert 'porch' in registry and 'attic' not in registry
+
+
+def test_update_keeps_existing_devices():
+    registry = DeviceRegistry()
+    registry.update([{'id': 1, 'name': 'hall'}], _create)
+    hall = registry.get('hall')
+    devices = registry.devices()
+
+    added = registry.update([{'id': 1, 'name': 'hall'}, {'id': 2, 'name': 'porch'}], _create)
+
+    assert [device.get_name() for device in added] == ['porch']
+    assert registry.get('hall') is hall
+    assert len(devices) == 1  # earlier reads are not affected by swap
+    assert len(registry) == 2
+
+
+def test_version_changes_on_discovery_and_state_change():
+    registry = DeviceRegistry()
+    registry.update([{'id': 1, 'name': 'hall'}], _create)
+    version = registry.version
+
+    registry.update([{'id': 1, 'name': 'hall'}], _create)
+    assert registry.version == version  # nothing new
+
+    registry.get('hall').update_power(True, True)
+    assert registry.version == version + 1
+
+    registry.get('hall').update_power(True, True)
+    assert registry.version == version + 1  # same state
+
+
+def test_devices_are_compact():
+    registry = DeviceRegistry()
+    registry.update([{'id': i, 'name': ''.join(['device-', str(i)])} for i in (1, 2)], _create)
+    hall, porch = registry.devices()
+
+    assert not hasattr(hall, '__dict__')
+    assert hall.get_name() is sys.intern('device-1')
+    assert hall._listener is porch._listener
@@ -0,0 +1,63 @@
+from threading import Event
+import time
+
+import pytest
+
+from stick.scheduler import Scheduler
+
+
+def test_due_actions_dispatched_in_one_batch():
+    batches = []
+    done = Event()
+
+    def dispatch(batch):
+        batches.append(sorted(action['n'] for action in batch))
+        done.set()
+
+    scheduler = Scheduler(dispatch)
+    at = time.time() + 0.2
+    for n in range(3):
+        scheduler.add({'n': n}, at=at)
+    deleted = scheduler.add({'n': 3}, at=at)
+    assert scheduler.delete(deleted['id'])
+
+    assert done.wait(2)
+    assert batches == [[0, 1, 2]]
+    assert len(scheduler) == 0
+    scheduler.stop()
+
+
+def test_recurring_action_rescheduled_until_deleted():
+    runs = []
+    scheduler = Scheduler(runs.extend, min_interval=0.05)
+    schedule = scheduler.add({'power': 'on'}, every=0.05)
+
+    time.sleep(0.3)
+    assert scheduler.delete(schedule['id'])
+    count = len(runs)
+    assert count >= 3
+
+    time.sleep(0.2)
+    assert len(runs) == count
+    scheduler.stop()
+
+
+def test_bounded_number_of_schedules():
+    scheduler = Scheduler(lambda batch: None, max_schedules=2)
+    assert scheduler.add({}, at=time.time() + 60) is not None
+    assert scheduler.add({}, at=time.time() + 30) is not None
+    assert scheduler.add({}, at=time.time() + 90) is None
+    assert [schedule['next'] for schedule in scheduler.schedules()] == sorted(
+        schedule['next'] for schedule in scheduler.schedules())
+    scheduler.stop()
+
+
+@pytest.mark.parametrize('at, every', [(float('nan'), None), (float('inf'), None), (None, float('nan')),
+                                       (None, float('inf')), (None, 1e-6)])
+def test_invalid_times_rejected(at, every):
+    scheduler = Scheduler(lambda batch: None)
+
+    with pytest.raises(ValueError):
+        scheduler.add({}, at=at, every=every)
+
+    assert len(scheduler) == 0
@@ -0,0 +1,87 @@
+from functools import partial
+import threading
+import time
+
+from stick.commandqueue import CommandQueue
+from stick.sharedstate import SharedState
+from stick.tellstick import Tellstick
+
+from tests.fake_tellstick import FakeTellstick
+
+
+def worker_state(path, pid):
+    state = SharedState(path)
+    state._owner = lambda: pid  # as if opened by another worker process
+    return state
+
+
+def test_lease_held_by_one_process_until_released_or_expired(tmp_path):
+    path = str(tmp_path / 'shared.db')
+    first, second = worker_state(path, '1'), worker_state(path, '2')
+
+    assert first.acquire('refresh')
+    assert first.acquire('refresh')  # renewed by holder
+    assert not second.acquire('refresh')
+
+    first.release('refresh')
+    assert second.acquire('refresh', ttl=-1)
+    assert first.acquire('refresh')  # expired
+
+
+def test_workers_share_token_and_device_listing(tmp_path):
+    path = str(tmp_path / 'shared.db')
+
+    with FakeTellstick(devices=3) as fake:
+        workers = []
+        for pid in ('1', '2'):
+            worker = Tellstick('user', 'secret', address=fake.address, shared_state=path,
+                               reconcile={'enabled': False})
+            worker._shared = worker._state_file = worker_state(path, pid)
+            workers.append(worker)
+
+        assert len(workers[0].get_devices()) == 3
+        assert len(workers[1].get_devices()) == 3
+        assert fake.calls['/api/authorize'] == 1
+        assert fake.calls['/api/devices/list'] == 1
+
+        assert workers[1].get_device('device-2').set_power(True)  # uses shared token
+        assert fake.calls['/api/authorize'] == 1
+
+        workers[0].reconcile()
+        assert workers[0].get_device('device-2').json()['power'] is True
+        assert fake.calls['/api/devices/list'] == 1
+
+
+def test_lease_excludes_other_threads_of_process(tmp_path):
+    state = SharedState(str(tmp_path / 'shared.db'))
+    assert state.acquire('list')
+
+    results = []
+    thread = threading.Thread(target=lambda: results.extend([state.acquire('list'), state.release('list')]))
+    thread.start()
+    thread.join()
+
+    assert results[0] is False
+    assert not worker_state(str(tmp_path / 'shared.db'), '2').acquire('list')  # not released by other thread
+
+
+def test_reserved_slots_shared_by_processes(tmp_path):
+    path = str(tmp_path / 'shared.db')
+    first, second = worker_state(path, '1'), worker_state(path, '2')
+
+    slots = [first.reserve('commands', 0.5), second.reserve('commands', 0.5), first.reserve('commands', 0.5)]
+
+    assert slots[1] - slots[0] >= 0.5 and slots[2] - slots[1] >= 0.5
+
+
+def test_command_rate_shared_by_workers(tmp_path):
+    path = str(tmp_path / 'shared.db')
+    sent = []
+
+    queues = [CommandQueue(lambda id, on_off: sent.append(time.monotonic()) or True, rate=20,
+                           reserve=partial(worker_state(path, pid).reserve, 'commands')) for pid in ('1', '2')]
+    futures = [queue.submit(id, True) for id in range(5) for queue in queues]
+    assert all(future.result(5) for future in futures)
+
+    sent.sort()
+    assert sent[-1] - sent[0] >= 9 * 0.05 * 0.9  # 10 commands at 20 per second, not 40
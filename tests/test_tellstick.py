@@ -0,0 +1,206 @@
+import json
+import socket
+import threading
+import time
+
+import stick.tellstick as tellstick
+from stick.tellstick import Tellstick
+
+from tests.fake_tellstick import FakeTellstick, TURNON
+
+
+def test_construction_is_lazy():
+    with FakeTellstick() as fake:
+        Tellstick('user', 'secret', address=fake.address)
+
+        assert sum(fake.calls.values()) == 0
+
+
+def test_discovery_answered_by_fake(monkeypatch):
+    with FakeTellstick() as fake:
+        monkeypatch.setattr(tellstick, 'DISCOVERY_ADDRESS', fake.discovery_address)
+
+        assert tellstick.discover_tellstick() == '127.0.0.1'
+        assert tellstick.discover_tellsticks(window=0.2) == ['127.0.0.1']
+        assert fake.calls['discovery'] == 2
+
+
+def test_discovery_without_answer_returns_none(monkeypatch):
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as silent:
+        silent.bind(('127.0.0.1', 0))
+        monkeypatch.setattr(tellstick, 'DISCOVERY_ADDRESS', silent.getsockname())
+
+        assert tellstick.discover_tellstick(timeout=0.1) is None
+
+
+def test_discovery_failing_to_send_returns_empty(monkeypatch):
+    monkeypatch.setattr(tellstick, 'DISCOVERY_ADDRESS', ('invalid.', 30303))
+
+    assert tellstick.discover_tellsticks(window=0.1) == []
+
+
+def test_missing_tellstick_serves_empty_device_list(monkeypatch):
+    discoveries = []
+    monkeypatch.setattr(tellstick, 'discover_tellstick', lambda: discoveries.append(1))
+
+    client = Tellstick('user', 'secret')
+    assert client.get_devices() == []
+    assert client.get_devices() == []
+    assert len(discoveries) == 1  # not discovered again within rediscovery interval
+
+
+def test_unreachable_persisted_address_is_rediscovered(tmp_path, monkeypatch):
+    state_file = tmp_path / 'state.json'
+
+    with FakeTellstick() as fake:
+        state_file.write_text(json.dumps({'address': '127.0.0.1:1', 'bearer': fake.token,
+                                          'expiry': time.time() + 3600, 'renewal_allowed': True}))
+        monkeypatch.setattr(tellstick, 'discover_tellstick', lambda: fake.address)
+
+        client = Tellstick('user', 'secret', state_file=str(state_file))
+        assert len(client.get_devices()) == 10
+        assert client.address == fake.address
+        assert fake.calls['/api/authorize'] == 0  # persisted token still valid
+        assert json.loads(state_file.read_text())['address'] == fake.address
+
+
+def test_state_file_reused_on_restart(tmp_path):
+    state_file = str(tmp_path / 'state.json')
+
+    with FakeTellstick(allow_renew=False) as fake:
+        client = Tellstick('user', 'secret', address=fake.address, state_file=state_file)
+        assert len(client.get_devices()) == 10
+        assert fake.calls['/api/authorize'] == 1
+
+        restarted = Tellstick('user', 'secret', state_file=state_file)  # no address, no discovery
+        assert restarted.get_device('device-1').set_power(True)
+        assert fake.calls['/api/authorize'] == 1
+
+
+def test_rejected_persisted_token_authorizes_again(tmp_path):
+    state_file = str(tmp_path / 'state.json')
+
+    with FakeTellstick(allow_renew=False) as fake:
+        Tellstick('user', 'secret', address=fake.address, state_file=state_file).get_devices()
+
+        fake.token = 'rotated'
+        restarted = Tellstick('user', 'secret', state_file=state_file)
+        restarted.get_devices()  # rejected, token is dropped
+        assert len(restarted.get_devices()) == 10
+        assert fake.calls['/api/authorize'] == 2
+
+
+def test_failed_commands_do_not_leak_refresh_threads():
+    with FakeTellstick(failure_rate=1.0) as fake:
+        client = Tellstick('user', 'secret', address=fake.address, commands={'retry_backoff': 0},
+                           transport={'failure_threshold': 1000})
+        assert not client.power(1, True)  # authorizes and starts refresh thread
+        threads = threading.active_count()
+
+        for _ in range(50):
+            assert not client.power(1, True)
+
+        assert threading.active_count() == threads
+        assert fake.calls['/api/device/turnOn'] == 51 * 3  # every command retried twice
+        assert fake.calls['/api/refreshToken'] == 0  # token is not refreshed on server errors
+
+
+def test_unknown_device_command_is_not_retried():
+    with FakeTellstick() as fake:
+        client = Tellstick('user', 'secret', address=fake.address, commands={'retry_backoff': 0})
+
+        assert not client.power(404, True)
+        assert fake.calls['/api/device/turnOn'] == 1
+        assert fake.calls['/api/refreshToken'] == 0
+
+
+def test_failed_command_retried_after_refresh():
+    with FakeTellstick() as fake:
+        client = Tellstick('user', 'secret', address=fake.address)
+        client.get_devices()
+
+        fake.token = 'rotated'  # old token rejected, refresh is rejected too, so login again
+        assert client.power(1, True)
+        assert fake.calls['/api/authorize'] == 2
+
+
+def test_clients_do_not_share_devices():
+    with FakeTellstick(devices=3) as first, FakeTellstick(devices=5) as second:
+        assert len(Tellstick('user', 'secret', address=first.address).get_devices()) == 3
+        assert len(Tellstick('user', 'secret', address=second.address).get_devices()) == 5
+
+
+def test_async_power_is_optimistic_and_rolled_back():
+    with FakeTellstick() as fake:
+        device = Tellstick('user', 'secret', address=fake.address).get_device('device-1')
+
+        assert device.set_power_async(True).result(1)
+        assert device.json()['power'] is True
+
+        fake.failure_rate = 1.0
+        future = device.set_power_async(False)
+        assert device.json()['power'] is False  # optimistic
+        assert not future.result(2)
+        assert device.json()['power'] is True  # rolled back
+
+
+def test_reconcile_picks_up_state_changed_outside_stick():
+    with FakeTellstick() as fake:
+        client = Tellstick('user', 'secret', address=fake.address, reconcile={'enabled': False})
+        assert client.get_device('device-2').json()['power'] is False  # state from listing
+
+        fake.devices[2]['state'] = TURNON  # turned on by a remote
+        assert client.reconcile() == 1
+        assert client.get_device('device-2').json()['power'] is True
+
+        assert client.reconcile() == 0
+
+        assert client.get_device('device-3').set_power(True)  # by stick, not counted
+        assert client.reconcile() == 0
+
+
+def test_close_stops_reconciler():
+    with FakeTellstick() as fake:
+        client = Tellstick('user', 'secret', address=fake.address,
+                           reconcile={'min_interval': 0.01, 'max_interval': 0.01})
+        client.get_devices()
+        client.close()
+        time.sleep(0.05)  # a pass already running may finish
+
+        listings = fake.calls['/api/devices/list']
+        time.sleep(0.1)
+        assert fake.calls['/api/devices/list'] == listings
+        assert not client._reconciler._thread.is_alive()
+
+
+def test_listing_requested_before_command_does_not_revert_state():
+    with FakeTellstick() as fake:
+        client = Tellstick('user', 'secret', address=fake.address, reconcile={'enabled': False})
+        device = client.get_device('device-2')
+
+        listed_at = time.time()
+        stale = [dict(raw_device) for raw_device in fake.devices.values()]  # device-2 still off
+        assert device.set_power(True)
+
+        client._apply_listing(stale, listed_at)
+        assert device.json()['power'] is True
+
+        client._apply_listing(stale, time.time())  # listed after command, changed outside stick
+        assert device.json()['power'] is False
+
+
+def test_offline_tellstick_opens_breaker_and_serves_cached_devices():
+    fake = FakeTellstick().start()
+    client = Tellstick('user', 'secret', address=fake.address, transport={'failure_threshold': 2},
+                       commands={'retry_backoff': 0}, reconcile={'enabled': False})
+    assert len(client.get_devices()) == 10
+
+    fake.stop()
+    client._transport.close()  # drop kept-alive connections, as a powered off tellstick would
+    assert not client.power(1, True)  # fails twice, breaker opens before last retry
+    assert client.breaker_stats()['state'] == 'open'
+    assert len(client.breaker_stats()['recent_failures']) == 2
+
+    client.reconcile()  # fails fast
+    assert len(client.get_devices()) == 10
+    assert client.breaker_stats()['consecutive_failures'] == 2
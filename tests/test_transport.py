@@ -0,0 +1,28 @@
+from stick.transport import Transport
+
+from tests.fake_tellstick import FakeTellstick
+
+
+def test_transport_reuses_connection():
+    with FakeTellstick() as fake:
+        transport = Transport(fake.address)
+        transport.set_bearer(fake.token)
+
+        for _ in range(20):
+            response = transport.get('/api/device/turnOn', params={'id': 1})
+            assert response.status_code == 200
+
+        assert fake.connections == 1
+        transport.close()
+
+
+def test_transport_sends_bearer():
+    with FakeTellstick() as fake:
+        transport = Transport(fake.address)
+
+        assert transport.get('/api/devices/list').status_code == 401
+
+        transport.set_bearer(fake.token)
+        assert transport.get('/api/devices/list').status_code == 200
+
+        transport.close()